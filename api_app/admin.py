@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import Tombstone
 
-# Register your models here.
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'organization', 'deleted_at']
+    list_filter = ['kind']
+    readonly_fields = ['organization', 'kind', 'object_id', 'deleted_at']
@@ -0,0 +1,120 @@
+"""
+Incremental change feed over clients, invoices and payments.
+
+Every row carries an `updated_at` stamp and deletions leave a Tombstone, so
+"what changed since X" is a range scan of the (organization, updated_at, id)
+index of each table from the watermark X, merged in (timestamp, id) order.
+Each poll costs a few queries per page of changes however large the
+organization is. The cursor is the (timestamp, id) of the last change sent.
+
+Rows stamped in the last CHANGE_FEED_SETTLE_SECONDS are held back until the
+next poll: a transaction may commit shortly after its rows were stamped, and
+a cursor that had already moved past them would skip them.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Tombstone
+
+ACTION_UPDATED = 'updated'
+ACTION_CANCELLED = 'cancelled'
+ACTION_DELETED = 'deleted'
+
+
+class Change:
+    """
+    One entry of the feed. `obj` is the current row, or None for a deletion;
+    `position` is the (timestamp, id) the feed is ordered and resumed by.
+    """
+
+    def __init__(self, kind, object_id, position, obj=None, action=ACTION_UPDATED):
+        self.kind = kind
+        self.object_id = object_id
+        self.position = position
+        self.obj = obj
+        self.action = action
+
+    @property
+    def changed_at(self):
+        return self.position[0]
+
+
+def encode_cursor(position):
+    changed_at, pk = position
+    raw = json.dumps([changed_at.isoformat(), str(pk)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, uuid) from a cursor, or None when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        changed_at, pk = json.loads(raw)
+        changed_at = datetime.fromisoformat(changed_at)
+        if timezone.is_naive(changed_at):
+            return None
+        return changed_at, uuid.UUID(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def cursor_expired(position):
+    """True when tombstones from after `position` may already have been purged."""
+    return position[0] < timezone.now() - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+
+
+def _sources(organization):
+    from clients.models import Client
+    from invoices.models import Invoice
+    from payments.models import Payment
+
+    return [
+        (Tombstone.KIND_CLIENT, Client.objects.filter(organization=organization), 'updated_at'),
+        (Tombstone.KIND_INVOICE, Invoice.objects.filter(organization=organization).select_related('client'),
+         'updated_at'),
+        (Tombstone.KIND_PAYMENT, Payment.objects.filter(organization=organization).select_related('invoice'),
+         'updated_at'),
+        (None, Tombstone.objects.filter(organization=organization), 'deleted_at'),
+    ]
+
+
+def _after(field, position):
+    # `>= t` keeps the scan on the index; the exclude drops rows at t up to the id.
+    changed_at, pk = position
+    return Q(**{f'{field}__gte': changed_at}) & ~Q(**{field: changed_at, 'pk__lte': pk})
+
+
+def changes_since(organization, position=None, limit=100):
+    """
+    Up to `limit` changes after `position` (from the start when None), oldest
+    first, and whether more are waiting. Each table is read for at most
+    limit + 1 rows past the watermark.
+    """
+    from invoices.models import Invoice
+
+    horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    changes = []
+    for kind, queryset, field in _sources(organization):
+        queryset = queryset.filter(**{f'{field}__lt': horizon})
+        if position:
+            queryset = queryset.filter(_after(field, position))
+        for obj in queryset.order_by(field, 'pk')[:limit + 1]:
+            if kind is None:
+                # Tombstones are ordered by their own id, so every position stays unique.
+                changes.append(Change(obj.kind, obj.object_id, (obj.deleted_at, obj.pk), action=ACTION_DELETED))
+                continue
+            action = ACTION_UPDATED
+            if kind == Tombstone.KIND_INVOICE and obj.status == Invoice.STATUS_CANCELLED:
+                action = ACTION_CANCELLED
+            changes.append(Change(kind, obj.pk, (obj.updated_at, obj.pk), obj, action))
+    changes.sort(key=lambda change: change.position)
+    return changes[:limit], len(changes) > limit
+
+
+def purge_tombstones():
+    cutoff = timezone.now() - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:57
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('client', 'Client'), ('invoice', 'Invoice'), ('payment', 'Payment')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'indexes': [models.Index(fields=['organization', 'deleted_at', 'id'], name='tombstone_org_deleted_idx')],
+            },
+        ),
+    ]
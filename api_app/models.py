@@ -1,3 +1,35 @@
+import uuid
 from django.db import models
+from django.utils import timezone
+from organizations.models import Organization
 
-# Create your models here.
+
+class Tombstone(models.Model):
+    """
+    Marker left behind when a client, invoice or payment is deleted, so the
+    change feed can tell API consumers to drop their copy. Written by a
+    post_delete receiver; pruned after CHANGE_FEED_RETENTION_DAYS.
+    """
+    KIND_CLIENT = 'client'
+    KIND_INVOICE = 'invoice'
+    KIND_PAYMENT = 'payment'
+    KIND_CHOICES = [
+        (KIND_CLIENT, 'Client'),
+        (KIND_INVOICE, 'Invoice'),
+        (KIND_PAYMENT, 'Payment'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Tombstone'
+        indexes = [
+            models.Index(fields=['organization', 'deleted_at', 'id'], name='tombstone_org_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}'
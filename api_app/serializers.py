@@ -0,0 +1,153 @@
+from datetime import date
+from decimal import Decimal
+from rest_framework import serializers
+from clients.models import Client
+from invoices.models import Invoice, InvoiceLineItem
+from payments.models import Payment
+
+
+def requested_fields(request):
+    """Field names from ?fields=a,b,c, or None when every field is wanted."""
+    fields = request.query_params.get('fields') if request is not None else None
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Drops top-level fields not named in ?fields= (when given)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get('request'))
+        if wanted:
+            for name in set(self.fields) - wanted - {'id'}:
+                self.fields.pop(name)
+
+
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Client
+        fields = [
+            'id', 'name', 'email', 'phone', 'billing_address', 'currency', 'tax_id', 'notes', 'is_active',
+            *Client.LEDGER_FIELDS, 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['is_active', 'created_at', 'updated_at']
+
+
+class LineItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InvoiceLineItem
+        fields = ['id', 'description', 'quantity', 'unit_price', 'tax_rate', 'discount', 'amount']
+
+
+class InvoicePaymentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = ['id', 'amount', 'payment_date', 'method', 'created_at']
+
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.name', read_only=True)
+    balance_due = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    line_items = LineItemSerializer(many=True, read_only=True)
+    payments = InvoicePaymentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Invoice
+        fields = [
+            'id', 'invoice_number', 'client', 'client_name', 'status', 'issue_date', 'due_date',
+            'subtotal', 'discount_amount', 'tax_amount', 'total', 'amount_paid', 'balance_due',
+            'notes', 'terms', 'sent_at', 'viewed_at', 'created_at', 'updated_at', 'line_items', 'payments',
+        ]
+
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    invoice_number = serializers.CharField(source='invoice.invoice_number', read_only=True)
+
+    class Meta:
+        model = Payment
+        fields = [
+            'id', 'invoice', 'invoice_number', 'amount', 'payment_date', 'method',
+            'stripe_charge_id', 'receipt', 'notes', 'created_at',
+        ]
+
+
+class BatchLineItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InvoiceLineItem
+        fields = ['description', 'quantity', 'unit_price', 'tax_rate', 'discount']
+        # Decimal defaults, so amounts are computed before anything is saved.
+        extra_kwargs = {
+            'quantity': {'default': Decimal('1')},
+            'tax_rate': {'default': Decimal('0')},
+            'discount': {'default': Decimal('0')},
+        }
+
+
+class BatchInvoiceSerializer(serializers.ModelSerializer):
+    """One entry of a batch create; the client is checked against the org by the view."""
+    client = serializers.UUIDField()
+    line_items = BatchLineItemSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Invoice
+        fields = ['client', 'issue_date', 'due_date', 'discount_amount', 'notes', 'terms', 'line_items']
+        extra_kwargs = {'due_date': {'required': False}}
+
+    def validate(self, attrs):
+        if attrs.get('issue_date') and attrs.get('due_date') and attrs['due_date'] < attrs['issue_date']:
+            raise serializers.ValidationError({'due_date': 'Must not be before issue_date.'})
+        return attrs
+
+
+class AllocationSerializer(serializers.Serializer):
+    invoice = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class ReceiptSerializer(serializers.Serializer):
+    """Input for splitting one receipt across a client's invoices."""
+    client = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    payment_date = serializers.DateField(default=date.today)
+    method = serializers.ChoiceField(choices=Payment.METHOD_CHOICES, default=Payment.METHOD_BANK_TRANSFER)
+    reference = serializers.CharField(max_length=200, allow_blank=True, default='')
+    allocations = AllocationSerializer(many=True, required=False)
+
+    def validate_allocations(self, value):
+        invoices = [allocation['invoice'] for allocation in value]
+        if len(set(invoices)) != len(invoices):
+            raise serializers.ValidationError('Each invoice may appear only once.')
+        return value
+
+
+class RevenueReportQuerySerializer(serializers.Serializer):
+    """Query parameters for the revenue report."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(default=date.today)
+    granularity = serializers.ChoiceField(choices=['day', 'week', 'month', 'quarter'], default='month')
+    client = serializers.UUIDField(required=False)
+    group_by = serializers.ChoiceField(choices=['currency', 'client'], default='currency')
+
+    def validate(self, attrs):
+        attrs.setdefault('start', attrs['end'].replace(month=1, day=1))
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        return attrs
+
+
+class AgingReportQuerySerializer(serializers.Serializer):
+    """Query parameters for the aging report and its drill-down."""
+    as_of = serializers.DateField(default=date.today)
+    bucket = serializers.ChoiceField(
+        choices=['current', 'days_1_30', 'days_31_60', 'days_61_90', 'over_90'], required=False,
+    )
+    client = serializers.UUIDField(required=False)
+    export = serializers.ChoiceField(choices=['csv', 'xlsx'], required=False)
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """Query parameters for the change feed."""
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=1000, default=100)
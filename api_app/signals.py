@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from clients.models import Client
+from invoices.models import Invoice
+from organizations.models import Organization
+from payments.models import Payment
+from .models import Tombstone
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Payment)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Deleting the organization takes its tombstones with it; there is nothing left to sync.
+    if isinstance(origin, Organization) or getattr(origin, 'model', None) is Organization:
+        return
+    Tombstone.objects.create(
+        organization_id=instance.organization_id, kind=sender._meta.model_name, object_id=instance.pk,
+    )
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+
+@shared_task(ignore_result=True)
+def purge_tombstones():
+    """Drop change-feed tombstones older than CHANGE_FEED_RETENTION_DAYS."""
+    from .changes import purge_tombstones
+    purge_tombstones()
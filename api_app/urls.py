@@ -16,4 +16,5 @@ urlpatterns = [
     path('auth/token/refresh/', views.TokenRefreshView.as_view(), name='token_refresh'),
     path('reports/revenue/', views.RevenueReportView.as_view(), name='revenue_report'),
     path('reports/aging/', views.AgingReportView.as_view(), name='aging_report'),
+    path('changes/', views.ChangeFeedView.as_view(), name='changes'),
 ]
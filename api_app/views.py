@@ -1,34 +1,378 @@
-from rest_framework import viewsets, permissions, generics
+import uuid
+from datetime import date
+from django.conf import settings
+from rest_framework import viewsets, mixins, permissions, generics, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .pagination import CreatedCursorPagination
+from .serializers import (
+    AgingReportQuerySerializer, BatchInvoiceSerializer, ChangeFeedQuerySerializer, ClientSerializer,
+    InvoiceSerializer, PaymentSerializer, ReceiptSerializer, RevenueReportQuerySerializer, requested_fields,
+)
 
 __all__ = [
     'ClientViewSet', 'InvoiceViewSet', 'PaymentViewSet',
-    'RevenueReportView', 'AgingReportView',
+    'RevenueReportView', 'AgingReportView', 'ChangeFeedView',
     'TokenObtainPairView', 'TokenRefreshView',
 ]
 
 
-class ClientViewSet(viewsets.ViewSet):
-    def list(self, request):
-        return Response([])
+def get_org(request):
+    m = request.user.memberships.select_related('organization').first()
+    return m.organization if m else None
 
 
-class InvoiceViewSet(viewsets.ViewSet):
-    def list(self, request):
-        return Response([])
+def _uuid_param(params, name):
+    value = params.get(name, '')
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({name: ['Must be a valid UUID.']})
 
 
-class PaymentViewSet(viewsets.ViewSet):
-    def list(self, request):
-        return Response([])
+def _date_param(params, name):
+    value = params.get(name, '')
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: ['Must be a date in YYYY-MM-DD format.']})
+
+
+class ClientViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """The organization's clients. Filters: ?q=, ?active=1|0; ?fields= for a subset of fields."""
+    serializer_class = ClientSerializer
+    pagination_class = CreatedCursorPagination
+
+    def get_queryset(self):
+        from clients.models import Client
+        params = self.request.query_params
+        return Client.filtered(get_org(self.request), params.get('q', ''), params.get('active', ''))
+
+    def perform_create(self, serializer):
+        serializer.save(organization=get_org(self.request))
+
+
+class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The organization's invoices with line items and payments. Filters:
+    ?status=, ?q=, ?client=; ?fields= picks fields, and leaving out
+    line_items / payments skips loading them altogether.
+    """
+    serializer_class = InvoiceSerializer
+    pagination_class = CreatedCursorPagination
+
+    def get_queryset(self):
+        from invoices.models import Invoice
+        params = self.request.query_params
+        qs = Invoice.filtered(get_org(self.request), params.get('status', ''), params.get('q', ''))
+        if params.get('client'):
+            qs = qs.filter(client=_uuid_param(params, 'client'))
+        fields = requested_fields(self.request)
+        for relation in ('line_items', 'payments'):
+            if fields is None or relation in fields:
+                qs = qs.prefetch_related(relation)
+        return qs
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Create up to INVOICE_BATCH_MAX_SIZE draft invoices from `invoices`.
+        Entries are checked one by one: the valid ones are created together
+        and the rest come back with their errors, keyed by position.
+        """
+        from clients.models import Client
+        from invoices.models import Invoice, InvoiceLineItem
+
+        entries = request.data.get('invoices') if isinstance(request.data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return Response({'invoices': ['A non-empty list is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.INVOICE_BATCH_MAX_SIZE
+        if len(entries) > limit:
+            return Response({'invoices': [f'At most {limit} invoices per request.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        org = get_org(request)
+        results = [None] * len(entries)
+        valid = []
+        for index, entry in enumerate(entries):
+            serializer = BatchInvoiceSerializer(data=entry)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+        clients = set(
+            Client.objects.filter(organization=org, is_active=True, pk__in={data['client'] for _, data in valid})
+            .values_list('pk', flat=True)
+        )
+        batch = []
+        for index, data in valid:
+            if data['client'] not in clients:
+                errors = {'client': ['Unknown or inactive client.']}
+                results[index] = {'index': index, 'status': 'error', 'errors': errors}
+                continue
+            items = [InvoiceLineItem(**item) for item in data.pop('line_items')]
+            batch.append((index, Invoice(client_id=data.pop('client'), **data), items))
+
+        Invoice.create_batch(org, [(invoice, items) for _, invoice, items in batch])
+        for index, invoice, _ in batch:
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'id': str(invoice.pk),
+                'invoice_number': invoice.invoice_number,
+                'total': f'{invoice.total:.2f}',
+            }
+        failed = len(entries) - len(batch)
+        if not failed:
+            code = status.HTTP_201_CREATED
+        elif batch:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(batch), 'failed': failed, 'results': results}, status=code)
+
+    @action(detail=False, methods=['post'], url_path='bulk-send')
+    def bulk_send(self, request):
+        """Queue emails for `invoice_ids`; returns the outcome for each invoice."""
+        from invoices.emails import queue_invoice_emails
+
+        invoice_ids = request.data.get('invoice_ids')
+        if not isinstance(invoice_ids, list) or not invoice_ids:
+            return Response({'invoice_ids': ['A non-empty list is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        outcomes = queue_invoice_emails(get_org(request), invoice_ids)
+        return Response({
+            'queued': sum(1 for outcome in outcomes.values() if outcome == 'queued'),
+            'results': outcomes,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+    """The organization's payments. Filters: ?client=, ?method=, ?from= / ?to= (payment date)."""
+    serializer_class = PaymentSerializer
+    pagination_class = CreatedCursorPagination
+
+    def get_queryset(self):
+        from payments.models import Payment
+        params = self.request.query_params
+        return Payment.filtered(
+            get_org(self.request),
+            client=_uuid_param(params, 'client'),
+            method=params.get('method', ''),
+            date_from=_date_param(params, 'from'),
+            date_to=_date_param(params, 'to'),
+        ).select_related('invoice')
+
+    @action(detail=False, methods=['post'])
+    def allocate(self, request):
+        """Record one receipt split across invoices (explicit `allocations` or oldest due first)."""
+        from django.core.exceptions import ValidationError
+        from clients.models import Client
+        from payments.models import Receipt
+
+        serializer = ReceiptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        org = get_org(request)
+        client = Client.objects.filter(organization=org, pk=data['client']).first()
+        if client is None:
+            return Response({'client': ['Unknown client.']}, status=status.HTTP_400_BAD_REQUEST)
+        allocations = {a['invoice']: a['amount'] for a in data.get('allocations', [])}
+        try:
+            receipt = Receipt.record(
+                org, client, data['amount'], data['payment_date'], data['method'],
+                reference=data['reference'], allocations=allocations or None,
+            )
+        except ValidationError as exc:
+            return Response({'allocations': exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'receipt': str(receipt.pk),
+            'amount': str(receipt.amount),
+            'unallocated_amount': str(receipt.unallocated_amount),
+            'allocations': [
+                {
+                    'invoice': str(payment.invoice_id),
+                    'invoice_number': payment.invoice.invoice_number,
+                    'amount': str(payment.amount),
+                    'status': payment.invoice.status,
+                }
+                for payment in receipt.allocations.select_related('invoice').order_by('invoice__due_date')
+            ],
+        }, status=status.HTTP_201_CREATED)
 
 
 class RevenueReportView(generics.GenericAPIView):
+    """
+    Invoiced, collected and outstanding per period, answered from the daily
+    revenue rollups. Query: start, end (YYYY-MM-DD; default this year to
+    date), granularity (day/week/month/quarter), client, group_by
+    (currency/client).
+    """
+
     def get(self, request):
-        return Response({'revenue': 0})
+        from dashboard.models import DailyRevenue
+
+        query = RevenueReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        rows = DailyRevenue.report(
+            get_org(request), params['start'], params['end'], params['granularity'],
+            client=params.get('client'), by_client=params['group_by'] == 'client',
+        )
+        results = []
+        for row in rows:
+            result = {
+                'period': row['period'].isoformat(),
+                'currency': row['currency'],
+                'invoiced': f"{row['invoiced']:.2f}",
+                'collected': f"{row['collected']:.2f}",
+                'outstanding': f"{row['outstanding']:.2f}",
+            }
+            if 'client' in row:
+                result.update(client=str(row['client']), client_name=row['client__name'])
+            results.append(result)
+        return Response({
+            'start': params['start'].isoformat(),
+            'end': params['end'].isoformat(),
+            'granularity': params['granularity'],
+            'results': results,
+        })
 
 
 class AgingReportView(generics.GenericAPIView):
+    """
+    Receivables aging per client at ?as_of= (default today), in current,
+    1-30, 31-60, 61-90 and 90+ days past due. ?bucket= (optionally with
+    ?client=) drills down to that bucket's invoices; ?export=csv|xlsx
+    downloads either view instead.
+    """
+    INVOICE_COLUMNS = [
+        ('Invoice #', 'invoice_number'), ('Client', 'client__name'), ('Status', 'status'),
+        ('Issue Date', 'issue_date'), ('Due Date', 'due_date'), ('Total', 'total'),
+        ('Paid', 'amount_paid'), ('Balance', 'balance'),
+    ]
+
     def get(self, request):
-        return Response({'aging': []})
+        from dashboard.aging import AGING_BUCKETS, BUCKET_NAMES, bucket_invoices, get_aging
+        from invoices.export import rows_response, tabular_response
+
+        query = AgingReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        org = get_org(request)
+        as_of = params['as_of']
+        export = params.get('export')
+
+        if params.get('bucket'):
+            invoices = bucket_invoices(org, as_of, params['bucket'], params.get('client'))
+            if export:
+                return tabular_response(invoices, self.INVOICE_COLUMNS, f'aging-{params["bucket"]}', export)
+            page = self.paginate_queryset(invoices.values(
+                'pk', 'invoice_number', 'client', 'client__name', 'status',
+                'issue_date', 'due_date', 'total', 'amount_paid', 'balance',
+            ))
+            return self.get_paginated_response([
+                {
+                    'id': str(row['pk']),
+                    'invoice_number': row['invoice_number'],
+                    'client': str(row['client']),
+                    'client_name': row['client__name'],
+                    'status': row['status'],
+                    'issue_date': row['issue_date'].isoformat(),
+                    'due_date': row['due_date'].isoformat(),
+                    'days_past_due': max((as_of - row['due_date']).days, 0),
+                    'total': f"{row['total']:.2f}",
+                    'amount_paid': f"{row['amount_paid']:.2f}",
+                    'balance': f"{row['balance']:.2f}",
+                }
+                for row in page
+            ])
+
+        report = get_aging(org, as_of)
+        if export:
+            columns = [('Client', 'client_name'), ('Currency', 'currency'), ('Invoices', 'invoice_count')]
+            columns += [(label, name) for name, label, _, _ in AGING_BUCKETS] + [('Total', 'total')]
+            rows = ([row[name] for _, name in columns] for row in report['clients'])
+            return rows_response(columns, rows, f'aging-{as_of}', export)
+        money = BUCKET_NAMES + ['total']
+        return Response({
+            'as_of': as_of.isoformat(),
+            'buckets': [{'name': name, 'label': label} for name, label, _, _ in AGING_BUCKETS],
+            'clients': [
+                {
+                    'client': str(row['client']),
+                    'client_name': row['client_name'],
+                    'currency': row['currency'],
+                    'invoice_count': row['invoice_count'],
+                    **{name: f'{row[name]:.2f}' for name in money},
+                }
+                for row in report['clients']
+            ],
+            'totals': {
+                currency: {name: f'{values[name]:.2f}' for name in money}
+                for currency, values in report['totals'].items()
+            },
+        })
+
+
+class ChangeFeedView(generics.GenericAPIView):
+    """
+    Clients, invoices and payments changed since ?cursor=, oldest first. Start
+    without a cursor, then pass back `next` each time; `has_more` says
+    whether to fetch again straight away. Deleted records come back as
+    "deleted" entries with no data and cancelled invoices as "cancelled".
+    ?page_size= (max 1000) and ?fields= as on the resource endpoints.
+    A cursor older than CHANGE_FEED_RETENTION_DAYS answers 410: resync
+    from the start.
+    """
+    SERIALIZERS = {'client': ClientSerializer, 'invoice': InvoiceSerializer, 'payment': PaymentSerializer}
+
+    def get(self, request):
+        from django.db.models import prefetch_related_objects
+        from .changes import changes_since, cursor_expired, decode_cursor, encode_cursor
+
+        query = ChangeFeedQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        position = None
+        if params.get('cursor'):
+            position = decode_cursor(params['cursor'])
+            if position is None:
+                raise ValidationError({'cursor': ['Invalid cursor.']})
+            if cursor_expired(position):
+                return Response({'cursor': ['Cursor has expired; resync from the start.']},
+                                status=status.HTTP_410_GONE)
+
+        changes, has_more = changes_since(get_org(request), position, params['page_size'])
+        invoices = [change.obj for change in changes if change.kind == 'invoice' and change.obj]
+        fields = requested_fields(request)
+        for relation in ('line_items', 'payments'):
+            if fields is None or relation in fields:
+                prefetch_related_objects(invoices, relation)
+
+        serializers = {
+            kind: serializer_class(context=self.get_serializer_context())
+            for kind, serializer_class in self.SERIALIZERS.items()
+        }
+        results = [
+            {
+                'type': change.kind,
+                'id': str(change.object_id),
+                'action': change.action,
+                'changed_at': change.changed_at.isoformat(),
+                'data': serializers[change.kind].to_representation(change.obj) if change.obj else None,
+            }
+            for change in changes
+        ]
+        if changes:
+            cursor = encode_cursor(changes[-1].position)
+        else:
+            cursor = params.get('cursor')
+        return Response({'results': results, 'next': cursor, 'has_more': has_more})
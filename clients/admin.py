@@ -1,10 +1,18 @@
 from django.contrib import admin
-from .models import Client
+from .models import Client, ClientImport
 
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'organization', 'currency', 'is_active', 'created_at']
+    list_display = ['name', 'email', 'organization', 'currency', 'outstanding_balance', 'is_active', 'created_at']
     list_filter = ['organization', 'currency', 'is_active']
     search_fields = ['name', 'email', 'phone']
     list_select_related = ['organization']
+    readonly_fields = Client.LEDGER_FIELDS
+
+
+@admin.register(ClientImport)
+class ClientImportAdmin(admin.ModelAdmin):
+    list_display = ['file', 'organization', 'status', 'row_count', 'created_count', 'updated_count', 'error_count', 'created_at']
+    list_filter = ['status']
+    readonly_fields = ['errors']
@@ -0,0 +1,125 @@
+"""
+Streaming client CSV import.
+
+The file is read row by row and written in chunks: emails already in the
+organization are pre-loaded into a dict, new clients go in with bulk_create
+and changed ones with bulk_update, so a 50k-row file costs a few queries per
+thousand rows instead of one get_or_create per row.
+"""
+import csv
+import io
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from .models import Client, ClientImport
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+# CSV columns copied onto the client when present (name and email are required).
+UPDATABLE_FIELDS = ['name', 'phone', 'billing_address', 'currency']
+
+
+def _clean(row, default_currency):
+    name = (row.get('name') or '').strip()
+    email = (row.get('email') or '').strip()
+    if not name or not email:
+        raise ValidationError('name and email are required')
+    validate_email(email)
+    currency = (row.get('currency') or '').strip().upper() or default_currency
+    if len(currency) != 3:
+        raise ValidationError(f'invalid currency "{currency}"')
+    phone = (row.get('phone') or '').strip()
+    if len(phone) > Client._meta.get_field('phone').max_length:
+        raise ValidationError('phone is too long')
+    return {
+        'name': name[:Client._meta.get_field('name').max_length],
+        'email': email,
+        'phone': phone,
+        'billing_address': (row.get('billing_address') or '').strip(),
+        'currency': currency,
+    }
+
+
+def import_clients(client_import):
+    """Create or update the org's clients from the import's CSV; returns it with counts set."""
+    org = client_import.organization
+    existing = {
+        email.lower(): pk
+        for pk, email in Client.objects.filter(organization=org).values_list('pk', 'email')
+    }
+    seen = set()
+    counts = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
+    errors = []
+    error_count = 0
+    touched = []
+
+    with client_import.file.open('rb') as binary:
+        reader = csv.DictReader(io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline=''))
+        reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames or []]
+        numbered = enumerate(reader, start=2)  # Row 1 is the header.
+        while chunk := list(islice(numbered, IMPORT_CHUNK_SIZE)):
+            new, changes = [], {}
+            for row_number, row in chunk:
+                counts['rows'] += 1
+                try:
+                    data = _clean(row, org.currency)
+                except ValidationError as exc:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': row_number, 'error': '; '.join(exc.messages)})
+                    continue
+                key = data['email'].lower()
+                if key in seen:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': row_number, 'error': f'duplicate email {data["email"]} in file'})
+                    continue
+                seen.add(key)
+                if key in existing:
+                    changes[existing[key]] = data
+                else:
+                    new.append(Client(organization=org, **data))
+
+            to_update = []
+            for client in Client.objects.filter(pk__in=list(changes)):
+                data = changes[client.pk]
+                if all(getattr(client, field) == data[field] for field in UPDATABLE_FIELDS):
+                    counts['unchanged'] += 1
+                    continue
+                for field in UPDATABLE_FIELDS:
+                    setattr(client, field, data[field])
+                client.updated_at = timezone.now()
+                to_update.append(client)
+            with transaction.atomic():
+                Client.objects.bulk_create(new)
+                Client.objects.bulk_update(to_update, UPDATABLE_FIELDS + ['updated_at'])
+            counts['created'] += len(new)
+            counts['updated'] += len(to_update)
+            touched.extend(new + to_update)
+            if len(touched) >= IMPORT_CHUNK_SIZE:
+                _after_write(org, touched)
+                touched = []
+    _after_write(org, touched)
+
+    client_import.row_count = counts['rows']
+    client_import.created_count = counts['created']
+    client_import.updated_count = counts['updated']
+    client_import.unchanged_count = counts['unchanged']
+    client_import.errors = errors
+    client_import.error_count = error_count
+    client_import.status = ClientImport.STATUS_COMPLETE
+    client_import.processed_at = timezone.now()
+    client_import.save()
+    return client_import
+
+
+def _after_write(org, clients):
+    """What Client.post_save would have done: refresh search docs and cached portal pages."""
+    if not clients:
+        return
+    from invoices import portal
+    from search.backends import index_clients
+    index_clients(clients)
+    portal.invalidate_organization(org.pk)
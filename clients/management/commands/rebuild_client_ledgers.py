@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from clients.models import Client
+
+
+class Command(BaseCommand):
+    help = "Recompute every client's receivables columns from its invoices and payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only rebuild clients of this organization id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        clients = Client.objects.order_by('pk')
+        if options['organization']:
+            clients = clients.filter(organization_id=options['organization'])
+        pks = list(clients.values_list('pk', flat=True))
+        size = options['batch_size']
+        for start in range(0, len(pks), size):
+            # One short transaction per batch keeps client row locks brief.
+            Client.refresh_ledgers(pks[start:start + size])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ledgers for {len(pks)} clients.'))
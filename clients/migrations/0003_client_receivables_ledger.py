@@ -0,0 +1,80 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:36
+
+from django.db import migrations, models
+from django.db.models import F, Max, Q, Sum
+
+OPEN_STATUSES = ['sent', 'viewed', 'partially_paid', 'overdue']
+
+
+def backfill(apps, schema_editor):
+    Client = apps.get_model('clients', 'Client')
+    Invoice = apps.get_model('invoices', 'Invoice')
+    Payment = apps.get_model('payments', 'Payment')
+    fields = ['outstanding_balance', 'overdue_balance', 'total_invoiced', 'total_paid', 'last_payment_date']
+    balance = F('total') - F('amount_paid')
+    pks = list(Client.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), 1000):
+        clients = list(Client.objects.filter(pk__in=pks[start:start + 1000]).only('pk'))
+        by_pk = {client.pk: client for client in clients}
+        rows = (
+            Invoice.objects.filter(client__in=by_pk).order_by().values('client').annotate(
+                outstanding_balance=Sum(balance, filter=Q(status__in=OPEN_STATUSES)),
+                overdue_balance=Sum(balance, filter=Q(status='overdue')),
+                total_invoiced=Sum('total', filter=~Q(status__in=['draft', 'cancelled'])),
+                total_paid=Sum('amount_paid'),
+            )
+        )
+        for row in rows:
+            client = by_pk[row.pop('client')]
+            for field, value in row.items():
+                setattr(client, field, value or 0)
+        last_payments = (
+            Payment.objects.filter(invoice__client__in=by_pk, amount__gt=0).order_by()
+            .values_list('invoice__client').annotate(last=Max('payment_date'))
+        )
+        for client_pk, last in last_payments:
+            by_pk[client_pk].last_payment_date = last
+        Client.objects.bulk_update(clients, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_clientimport'),
+        ('organizations', '0001_initial'),
+        ('invoices', '0004_invoice_status_due_idx'),
+        ('payments', '0005_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='last_payment_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='outstanding_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='overdue_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_invoiced',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['organization', '-total_invoiced'], name='client_org_invoiced_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
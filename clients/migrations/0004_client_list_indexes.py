@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_client_receivables_ledger'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['organization', 'is_active', 'name'], name='client_org_active_name_idx'),
+        ),
+    ]
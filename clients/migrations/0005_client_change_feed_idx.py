@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_client_list_indexes'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='client_org_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-18 08:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_client_change_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_org_invoiced_idx',
+        ),
+    ]
@@ -1,5 +1,7 @@
 import uuid
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from organizations.models import Organization
 
 
@@ -21,23 +23,233 @@ class Client(models.Model):
     tax_id = models.CharField(max_length=50, blank=True, verbose_name='VAT / Tax ID')
     notes = models.TextField(blank=True, help_text='Internal notes — not shown on invoices')
     is_active = models.BooleanField(default=True)
+    # Receivables ledger, moved by each invoice and payment write with
+    # apply_invoice_changes(); rebuild with `manage.py rebuild_client_ledgers`.
+    outstanding_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    overdue_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    last_payment_date = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    LEDGER_FIELDS = ['outstanding_balance', 'overdue_balance', 'total_invoiced', 'total_paid', 'last_payment_date']
+
     class Meta:
         verbose_name = 'Client'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['organization', 'is_active', 'name'], name='client_org_active_name_idx'),
+            models.Index(fields=['organization', 'updated_at', 'id'], name='client_org_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-    @property
-    def outstanding_balance(self):
-        """Sum of unpaid invoice totals for this client."""
+    @classmethod
+    def filtered(cls, organization, q='', active=''):
+        """Org clients narrowed by the list view's search box and ?active= flag."""
+        qs = cls.objects.filter(organization=organization)
+        if q:
+            from search.backends import matching_ids
+            from search.models import SearchDocument
+            qs = qs.filter(pk__in=matching_ids(organization, SearchDocument.KIND_CLIENT, q))
+        if active == '1':
+            qs = qs.filter(is_active=True)
+        elif active == '0':
+            qs = qs.filter(is_active=False)
+        return qs
+
+    @classmethod
+    def ledger_totals(cls, client_pks):
+        """{client_pk: {ledger field: value}} computed from invoices and payments in two grouped queries."""
         from invoices.models import Invoice
-        return Invoice.objects.filter(
-            client=self,
-            status__in=['sent', 'viewed', 'partially_paid', 'overdue'],
-        ).aggregate(
-            total=models.Sum(models.F('total') - models.F('amount_paid'))
-        )['total'] or 0
+        from payments.models import Payment
+
+        balance = models.F('total') - models.F('amount_paid')
+        totals = {
+            pk: {'outstanding_balance': 0, 'overdue_balance': 0, 'total_invoiced': 0, 'total_paid': 0,
+                 'last_payment_date': None}
+            for pk in client_pks
+        }
+        rows = (
+            Invoice.objects.filter(client__in=client_pks)
+            .order_by()
+            .values('client')
+            .annotate(
+                outstanding_balance=models.Sum(balance, filter=models.Q(status__in=Invoice.OPEN_STATUSES)),
+                overdue_balance=models.Sum(balance, filter=models.Q(status=Invoice.STATUS_OVERDUE)),
+                total_invoiced=models.Sum('total', filter=~models.Q(
+                    status__in=[Invoice.STATUS_DRAFT, Invoice.STATUS_CANCELLED],
+                )),
+                total_paid=models.Sum('amount_paid'),
+            )
+        )
+        for row in rows:
+            client_pk = row.pop('client')
+            totals[client_pk].update({field: value or 0 for field, value in row.items()})
+        last_payments = (
+            Payment.objects.filter(invoice__client__in=client_pks, amount__gt=0)
+            .order_by()
+            .values_list('invoice__client')
+            .annotate(last=models.Max('payment_date'))
+        )
+        for client_pk, last in last_payments:
+            totals[client_pk]['last_payment_date'] = last
+        return totals
+
+    @classmethod
+    def refresh_ledgers(cls, client_pks):
+        """
+        Recompute the receivables columns of the given clients from scratch,
+        under a row lock. Writes keep the columns in step incrementally; this is
+        for rebuild_client_ledgers to correct any drift.
+        """
+        client_pks = sorted({pk for pk in client_pks if pk}, key=str)
+        if not client_pks:
+            return
+        with transaction.atomic():
+            clients = list(
+                cls.objects.select_for_update().filter(pk__in=client_pks).order_by('pk').only('pk', *cls.LEDGER_FIELDS)
+            )
+            totals = cls.ledger_totals([client.pk for client in clients])
+            now = timezone.now()
+            changed = []
+            for client in clients:
+                if all(getattr(client, field) == value for field, value in totals[client.pk].items()):
+                    continue
+                for field, value in totals[client.pk].items():
+                    setattr(client, field, value)
+                # The balances are part of the API record, so the change feed picks them up.
+                client.updated_at = now
+                changed.append(client)
+            cls.objects.bulk_update(changed, cls.LEDGER_FIELDS + ['updated_at'], batch_size=500)
+
+    @staticmethod
+    def ledger_share(status, total, amount_paid):
+        """What one invoice in this state adds to its client's balance columns (see ledger_totals)."""
+        from invoices.models import Invoice
+
+        balance = total - amount_paid
+        return {
+            'outstanding_balance': balance if status in Invoice.OPEN_STATUSES else 0,
+            'overdue_balance': balance if status == Invoice.STATUS_OVERDUE else 0,
+            'total_invoiced': 0 if status in (Invoice.STATUS_DRAFT, Invoice.STATUS_CANCELLED) else total,
+            'total_paid': amount_paid,
+        }
+
+    @classmethod
+    def apply_invoice_changes(cls, changes):
+        """
+        Move the ledgers by each (before, after) pair of invoice ledger states,
+        (client_pk, status, total, amount_paid) or None for an invoice that was
+        just created or deleted.
+        """
+        deltas = {}
+        for before, after in changes:
+            for state, sign in ((before, -1), (after, 1)):
+                if state is None or state[0] is None:
+                    continue
+                client_pk, status, total, amount_paid = state
+                client_deltas = deltas.setdefault(client_pk, {})
+                for field, value in cls.ledger_share(status, total, amount_paid).items():
+                    client_deltas[field] = client_deltas.get(field, 0) + sign * value
+        cls.apply_ledger_deltas(deltas)
+
+    @classmethod
+    def apply_ledger_deltas(cls, deltas):
+        """
+        Add {client_pk: {field: delta}} to the balance columns with one F()
+        UPDATE per client, so concurrent writers never overwrite each other.
+        Clients are updated in pk order, so their row locks never deadlock.
+        """
+        now = timezone.now()
+        for client_pk in sorted(deltas, key=str):
+            changes = {field: models.F(field) + delta for field, delta in deltas[client_pk].items() if delta}
+            if changes:
+                # The balances are part of the API record, so the change feed picks them up.
+                cls.objects.filter(pk=client_pk).update(updated_at=now, **changes)
+
+    @classmethod
+    def record_payment_dates(cls, dates):
+        """Move last_payment_date forward for (client_pk, payment_date) pairs of new payments."""
+        latest = {}
+        for client_pk, day in dates:
+            if client_pk and day and (client_pk not in latest or day > latest[client_pk]):
+                latest[client_pk] = day
+        now = timezone.now()
+        for client_pk in sorted(latest, key=str):
+            cls.objects.filter(
+                models.Q(last_payment_date__isnull=True) | models.Q(last_payment_date__lt=latest[client_pk]),
+                pk=client_pk,
+            ).update(last_payment_date=latest[client_pk], updated_at=now)
+
+    @classmethod
+    def forget_payment_date(cls, client_pk, day=None):
+        """
+        Re-read last_payment_date after a payment dated `day` was removed or
+        moved; a no-op unless it was the client's latest. None re-reads it anyway.
+        """
+        from payments.models import Payment
+
+        latest = (
+            Payment.objects.filter(invoice__client=models.OuterRef('pk'), amount__gt=0)
+            .order_by('-payment_date')
+            .values('payment_date')[:1]
+        )
+        clients = cls.objects.filter(pk=client_pk)
+        if day is not None:
+            clients = clients.filter(last_payment_date=day)
+        clients.update(last_payment_date=models.Subquery(latest), updated_at=timezone.now())
+
+
+class ClientImport(models.Model):
+    """
+    A client CSV upload and its outcome. Large files are processed by a
+    Celery worker; `errors` lists the rows that could not be imported.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(
+        Organization, on_delete=models.CASCADE, related_name='client_imports',
+    )
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+    )
+    file = models.FileField(upload_to='imports/clients/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    row_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    # [{'row': n, 'error': '...'}], capped so a bad file can't bloat the row.
+    errors = models.JSONField(default=list, blank=True)
+    error_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Client Import'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.file.name} ({self.get_status_display()})'
+
+    def mark_failed(self, exc):
+        """Record an import that stopped on an unexpected error."""
+        self.status = self.STATUS_FAILED
+        self.errors = [{'row': None, 'error': str(exc)[:1000]}]
+        self.processed_at = timezone.now()
+        ClientImport.objects.filter(pk=self.pk).update(
+            status=self.status, errors=self.errors, processed_at=self.processed_at,
+        )
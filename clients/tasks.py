@@ -0,0 +1,16 @@
+from celery import shared_task
+
+
+@shared_task(ignore_result=True)
+def import_clients_csv(client_import_pk):
+    """Run a large client CSV import in the background."""
+    from .importer import import_clients
+    from .models import ClientImport
+
+    client_import = ClientImport.objects.select_related('organization').get(pk=client_import_pk)
+    ClientImport.objects.filter(pk=client_import.pk).update(status=ClientImport.STATUS_PROCESSING)
+    try:
+        import_clients(client_import)
+    except Exception as exc:
+        client_import.mark_failed(exc)
+        raise
@@ -6,8 +6,10 @@ app_name = 'clients'
 urlpatterns = [
     path('', views.client_list, name='list'),
     path('new/', views.client_create, name='create'),
+    path('export/', views.client_export, name='export'),
     path('<uuid:pk>/', views.client_detail, name='detail'),
     path('<uuid:pk>/edit/', views.client_update, name='update'),
     path('<uuid:pk>/delete/', views.client_delete, name='delete'),
     path('import/', views.client_import_csv, name='import_csv'),
+    path('import/<uuid:pk>/', views.client_import_detail, name='import_detail'),
 ]
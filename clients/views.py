@@ -1,12 +1,28 @@
-import csv
-import io
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Client
+from invoices.export import tabular_response
+from invoices.pagination import keyset_paginate
+from .importer import import_clients
+from .models import Client, ClientImport
 from .forms import ClientForm
 
+logger = logging.getLogger(__name__)
+
+CLIENTS_PER_PAGE = 50
+INVOICES_PER_PAGE = 25
+EXPORT_COLUMNS = [
+    ('Name', 'name'), ('Email', 'email'), ('Phone', 'phone'), ('Currency', 'currency'),
+    ('Tax ID', 'tax_id'), ('Billing Address', 'billing_address'), ('Active', 'is_active'),
+    ('Outstanding', 'outstanding_balance'), ('Overdue', 'overdue_balance'),
+    ('Total Invoiced', 'total_invoiced'), ('Total Paid', 'total_paid'),
+    ('Last Payment', 'last_payment_date'), ('Created', 'created_at'),
+]
+
 
 def get_org(request):
     m = request.user.memberships.select_related('organization').first()
@@ -16,16 +32,23 @@ def get_org(request):
 @login_required
 def client_list(request):
     org = get_org(request)
-    qs = Client.objects.filter(organization=org)
     q = request.GET.get('q', '')
-    if q:
-        qs = qs.filter(Q(name__icontains=q) | Q(email__icontains=q))
     active_filter = request.GET.get('active', '')
-    if active_filter == '1':
-        qs = qs.filter(is_active=True)
-    elif active_filter == '0':
-        qs = qs.filter(is_active=False)
-    return render(request, 'clients/list.html', {'clients': qs, 'q': q, 'org': org})
+    qs = Client.filtered(org, q, active_filter)
+    # Balances are ledger columns; only the page's invoice counts are aggregated.
+    qs = qs.annotate(invoice_count=Count('invoices'))
+    page = keyset_paginate(qs, request, ordering=['name', 'id'], per_page=CLIENTS_PER_PAGE)
+    return render(request, 'clients/list.html', {
+        'clients': page, 'page': page, 'q': q, 'active_filter': active_filter, 'org': org,
+    })
+
+
+@login_required
+def client_export(request):
+    """Stream every client matching the list filters as CSV or XLSX (?export=xlsx)."""
+    org = get_org(request)
+    clients = Client.filtered(org, request.GET.get('q', ''), request.GET.get('active', '')).order_by('name', 'id')
+    return tabular_response(clients, EXPORT_COLUMNS, 'clients', request.GET.get('export', 'csv'))
 
 
 @login_required
@@ -47,9 +70,13 @@ def client_create(request):
 @login_required
 def client_detail(request, pk):
     org = get_org(request)
-    client = get_object_or_404(Client, pk=pk, organization=org)
-    invoices = client.invoices.order_by('-created_at')
-    return render(request, 'clients/detail.html', {'client': client, 'invoices': invoices})
+    client = get_object_or_404(
+        Client.objects.annotate(invoice_count=Count('invoices')), pk=pk, organization=org,
+    )
+    page = keyset_paginate(
+        client.invoices.all(), request, ordering=['-created_at', '-id'], per_page=INVOICES_PER_PAGE,
+    )
+    return render(request, 'clients/detail.html', {'client': client, 'invoices': page, 'page': page})
 
 
 @login_required
@@ -85,23 +112,36 @@ def client_import_csv(request):
     org = get_org(request)
     if request.method == 'POST' and request.FILES.get('csv_file'):
         csv_file = request.FILES['csv_file']
-        decoded = csv_file.read().decode('utf-8')
-        reader = csv.DictReader(io.StringIO(decoded))
-        created = 0
-        for row in reader:
-            name = row.get('name', '').strip()
-            email = row.get('email', '').strip()
-            if name and email:
-                Client.objects.get_or_create(
-                    organization=org, email=email,
-                    defaults={
-                        'name': name,
-                        'phone': row.get('phone', ''),
-                        'billing_address': row.get('billing_address', ''),
-                        'currency': row.get('currency', org.currency),
-                    }
-                )
-                created += 1
-        messages.success(request, f'Imported {created} clients.')
+        client_import = ClientImport.objects.create(
+            organization=org, uploaded_by=request.user, file=csv_file,
+        )
+        if csv_file.size > settings.CLIENT_IMPORT_INLINE_BYTES:
+            from .tasks import import_clients_csv
+            pk = str(client_import.pk)
+            transaction.on_commit(lambda: import_clients_csv.delay(pk), robust=True)
+            messages.info(request, 'Large file — importing in the background.')
+            return redirect('clients:import_detail', pk=client_import.pk)
+
+        try:
+            import_clients(client_import)
+        except Exception as exc:
+            # Same handling as the background task: never leave the import pending.
+            logger.exception('Client import %s failed', client_import.pk)
+            client_import.mark_failed(exc)
+            messages.error(request, f'Import failed: {exc}')
+            return redirect('clients:import_detail', pk=client_import.pk)
+        messages.success(
+            request,
+            f'Imported {client_import.created_count} new clients, updated {client_import.updated_count}.',
+        )
+        if client_import.error_count:
+            return redirect('clients:import_detail', pk=client_import.pk)
         return redirect('clients:list')
     return render(request, 'clients/import_csv.html')
+
+
+@login_required
+def client_import_detail(request, pk):
+    org = get_org(request)
+    client_import = get_object_or_404(ClientImport, pk=pk, organization=org)
+    return render(request, 'clients/import_detail.html', {'client_import': client_import})
@@ -0,0 +1,101 @@
+"""
+Accounts-receivable aging.
+
+Open invoices are bucketed by how far past due they are at an as-of date in
+one grouped query: each bucket is a SUM(CASE WHEN due_date ... THEN
+total - amount_paid ELSE 0 END) per client. Balances are the current ones;
+the as-of date only moves the bucket boundaries (and leaves out invoices
+issued after it). Summaries are cached per org, as-of date and receivables
+generation, so any invoice or payment write retires them.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from .snapshot import receivables_generation
+
+AGING_CACHE_TIMEOUT = 15 * 60
+CENT = Decimal('0.01')
+
+# (name, label, min days past due, max days past due)
+AGING_BUCKETS = [
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1-30', 1, 30),
+    ('days_31_60', '31-60', 31, 60),
+    ('days_61_90', '61-90', 61, 90),
+    ('over_90', '90+', 91, None),
+]
+BUCKET_NAMES = [name for name, _, _, _ in AGING_BUCKETS]
+
+
+def _due_range(as_of, low, high):
+    """Q for invoices between `low` and `high` days past due at `as_of`."""
+    q = Q()
+    if low is not None:
+        q &= Q(due_date__lte=as_of - timedelta(days=low))
+    if high is not None:
+        q &= Q(due_date__gte=as_of - timedelta(days=high))
+    return q
+
+
+def open_invoices(organization, as_of):
+    from invoices.models import Invoice
+    return Invoice.objects.filter(
+        organization=organization,
+        status__in=Invoice.OPEN_STATUSES,
+        total__gt=F('amount_paid'),
+        issue_date__lte=as_of,
+    )
+
+
+def bucket_invoices(organization, as_of, bucket, client=None):
+    """Drill-down: the open invoices in one bucket, with `balance` and `days_past_due`."""
+    _, _, low, high = next(b for b in AGING_BUCKETS if b[0] == bucket)
+    invoices = open_invoices(organization, as_of).filter(_due_range(as_of, low, high))
+    if client:
+        invoices = invoices.filter(client=client)
+    return invoices.annotate(balance=F('total') - F('amount_paid')).order_by('due_date', 'pk')
+
+
+def compute_aging(organization, as_of):
+    balance = F('total') - F('amount_paid')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    buckets = {
+        name: Sum(Case(
+            When(_due_range(as_of, low, high), then=balance), default=Value(Decimal('0')), output_field=money,
+        ))
+        for name, _, low, high in AGING_BUCKETS
+    }
+    rows = (
+        open_invoices(organization, as_of)
+        .order_by()
+        .values('client', 'client__name', 'client__currency')
+        .annotate(**buckets, total=Sum(balance, output_field=money), invoice_count=Count('pk'))
+        .order_by('-total', 'client__name')
+    )
+    clients = [
+        {
+            'client': row['client'],
+            'client_name': row['client__name'],
+            'currency': row['client__currency'],
+            'invoice_count': row['invoice_count'],
+            **{name: (row[name] or Decimal('0')).quantize(CENT) for name in BUCKET_NAMES + ['total']},
+        }
+        for row in rows
+    ]
+    totals = {}
+    for row in clients:
+        per_currency = totals.setdefault(row['currency'], {name: Decimal('0') for name in BUCKET_NAMES + ['total']})
+        for name in BUCKET_NAMES + ['total']:
+            per_currency[name] += row[name]
+    return {'as_of': as_of, 'clients': clients, 'totals': totals}
+
+
+def get_aging(organization, as_of):
+    """The org's aging summary at `as_of`, from the cache when nothing has changed."""
+    key = f'aging:{organization.pk}:{as_of}:{receivables_generation(organization.pk)}'
+    report = cache.get(key)
+    if report is None:
+        report = compute_aging(organization, as_of)
+        cache.set(key, report, AGING_CACHE_TIMEOUT)
+    return report
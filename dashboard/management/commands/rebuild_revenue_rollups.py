@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from dashboard.models import DailyRevenue
+from organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily revenue rollups from invoices and payments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only rebuild this organization id.')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.order_by('pk')
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+        rows = 0
+        for organization in organizations.iterator():
+            # One transaction per organization keeps its client locks short.
+            rows += DailyRevenue.rebuild(organization)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} daily revenue rows.'))
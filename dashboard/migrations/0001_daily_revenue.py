@@ -0,0 +1,70 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill(apps, schema_editor):
+    DailyRevenue = apps.get_model('dashboard', 'DailyRevenue')
+    Client = apps.get_model('clients', 'Client')
+    Invoice = apps.get_model('invoices', 'Invoice')
+    Payment = apps.get_model('payments', 'Payment')
+    clients = {pk: (org_pk, currency) for pk, org_pk, currency in
+               Client.objects.values_list('pk', 'organization_id', 'currency')}
+    totals = {}
+    issued = (
+        Invoice.objects.exclude(status__in=['draft', 'cancelled']).order_by()
+        .values_list('client', 'issue_date').annotate(total=Sum('total'))
+    )
+    for client_pk, day, total in issued:
+        totals.setdefault((client_pk, day), [0, 0])[0] = total
+    received = (
+        Payment.objects.exclude(invoice__status__in=['draft', 'cancelled']).order_by().values_list('invoice__client', 'payment_date').annotate(total=Sum('amount'))
+    )
+    for client_pk, day, total in received:
+        totals.setdefault((client_pk, day), [0, 0])[1] = total
+    DailyRevenue.objects.bulk_create(
+        (
+            DailyRevenue(
+                organization_id=clients[client_pk][0], client_id=client_pk, currency=clients[client_pk][1],
+                date=day, invoiced=invoiced, collected=collected,
+            )
+            for (client_pk, day), (invoiced, collected) in totals.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('clients', '0004_client_list_indexes'),
+        ('organizations', '0001_initial'),
+        ('invoices', '0005_invoice_client_created_idx'),
+        ('payments', '0005_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('invoiced', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='clients.client')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'indexes': [models.Index(fields=['organization', 'date'], name='daily_revenue_org_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('client', 'date'), name='daily_revenue_client_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
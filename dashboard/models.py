@@ -1,3 +1,164 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Trunc
+from clients.models import Client
+from organizations.models import Organization
 
-# Create your models here.
+
+class DailyRevenue(models.Model):
+    """
+    Revenue rollup for one client and day: the total of invoices issued and
+    payments received against them that day, in the client's currency. Outstanding at any
+    date is the running sum of invoiced minus collected up to it.
+
+    Kept current by refresh() on invoice and payment writes; rebuild with
+    `manage.py rebuild_revenue_rollups`.
+    """
+    GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='daily_revenue')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='daily_revenue')
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'date'], name='daily_revenue_client_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'date'], name='daily_revenue_org_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.client_id} {self.date}: {self.invoiced} / {self.collected}'
+
+    @classmethod
+    def totals(cls, invoices, payments):
+        """
+        {(client_pk, date): [invoiced, collected]} from invoice and payment
+        querysets, counting only issued (not draft or cancelled) invoices and
+        the payments against them.
+        """
+        from invoices.models import Invoice
+
+        totals = {}
+        issued = (
+            invoices.exclude(status__in=[Invoice.STATUS_DRAFT, Invoice.STATUS_CANCELLED])
+            .order_by()
+            .values_list('client', 'issue_date')
+            .annotate(total=models.Sum('total'))
+        )
+        for client_pk, day, total in issued:
+            totals.setdefault((client_pk, day), [0, 0])[0] = total
+        # Payments on drafts and cancelled invoices leave `collected` alone, as
+        # those invoices leave `invoiced` alone; outstanding never goes negative.
+        received = (
+            payments.exclude(invoice__status__in=[Invoice.STATUS_DRAFT, Invoice.STATUS_CANCELLED])
+            .order_by()
+            .values_list('invoice__client', 'payment_date')
+            .annotate(total=models.Sum('amount'))
+        )
+        for client_pk, day, total in received:
+            totals.setdefault((client_pk, day), [0, 0])[1] = total
+        return totals
+
+    @classmethod
+    def refresh(cls, buckets):
+        """
+        Recompute the rollup rows for the given (client_pk, date) pairs from
+        their invoices and payments and upsert them. Locks the client rows
+        like Client.refresh_ledgers, so concurrent writes apply in turn.
+        """
+        from invoices.models import Invoice
+        from payments.models import Payment
+
+        buckets = {(client_pk, day) for client_pk, day in buckets if client_pk and day}
+        if not buckets:
+            return
+        client_pks = sorted({client_pk for client_pk, _ in buckets}, key=str)
+        days = {day for _, day in buckets}
+        with transaction.atomic():
+            clients = {
+                pk: (organization_id, currency)
+                for pk, organization_id, currency in Client.objects.select_for_update()
+                .filter(pk__in=client_pks).order_by('pk')
+                .values_list('pk', 'organization_id', 'currency')
+            }
+            totals = cls.totals(
+                Invoice.objects.filter(client__in=client_pks, issue_date__in=days),
+                Payment.objects.filter(invoice__client__in=client_pks, payment_date__in=days),
+            )
+            rows = [
+                cls(
+                    organization_id=clients[client_pk][0], client_id=client_pk,
+                    currency=clients[client_pk][1], date=day,
+                    invoiced=totals.get((client_pk, day), [0, 0])[0],
+                    collected=totals.get((client_pk, day), [0, 0])[1],
+                )
+                for client_pk, day in buckets if client_pk in clients
+            ]
+            cls.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['client', 'date'],
+                update_fields=['currency', 'invoiced', 'collected'],
+            )
+
+    @classmethod
+    def rebuild(cls, organization, batch_size=1000):
+        """Replace every rollup row of the organization; returns the number written."""
+        from invoices.models import Invoice
+        from payments.models import Payment
+
+        with transaction.atomic():
+            clients = dict(
+                Client.objects.select_for_update().filter(organization=organization).values_list('pk', 'currency')
+            )
+            totals = cls.totals(
+                Invoice.objects.filter(organization=organization),
+                Payment.objects.filter(invoice__organization=organization),
+            )
+            cls.objects.filter(organization=organization).delete()
+            cls.objects.bulk_create(
+                (
+                    cls(organization=organization, client_id=client_pk, currency=clients[client_pk],
+                        date=day, invoiced=invoiced, collected=collected)
+                    for (client_pk, day), (invoiced, collected) in totals.items()
+                    if client_pk in clients
+                ),
+                batch_size=batch_size,
+            )
+        return sum(1 for client_pk, _ in totals if client_pk in clients)
+
+    @classmethod
+    def report(cls, organization, start, end, granularity='month', client=None, by_client=False):
+        """
+        Invoiced and collected per period between `start` and `end` (inclusive),
+        per currency and optionally per client, with the outstanding balance
+        at the end of each period. Periods with no activity are omitted.
+        """
+        rows = cls.objects.filter(organization=organization)
+        if client:
+            rows = rows.filter(client=client)
+        keys = ['currency', 'client', 'client__name'] if by_client else ['currency']
+
+        balances = {
+            tuple(row[k] for k in keys): row['balance']
+            for row in rows.filter(date__lt=start).order_by().values(*keys)
+            .annotate(balance=models.Sum(models.F('invoiced') - models.F('collected')))
+        }
+        periods = (
+            rows.filter(date__range=(start, end))
+            .annotate(period=Trunc('date', granularity))
+            .order_by()
+            .values('period', *keys)
+            .annotate(invoiced=models.Sum('invoiced'), collected=models.Sum('collected'))
+            .order_by('period', *keys)
+        )
+        results = []
+        for row in periods:
+            key = tuple(row[k] for k in keys)
+            balances[key] = balances.get(key, 0) + row['invoiced'] - row['collected']
+            results.append({**row, 'outstanding': balances[key]})
+        return results
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from clients.models import Client
+from invoices.models import Invoice
+from invoices.signals import balances_changed
+from payments.models import Payment
+from .models import DailyRevenue
+from .snapshot import invalidate_snapshot
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'pdf_file', 'stripe_payment_intent'}:
+        return
+    invalidate_snapshot(instance.organization_id)
+    # Payment-driven saves (status only) never issue or cancel an invoice;
+    # their rollups follow the payment instead.
+    if not update_fields or {'total', 'issue_date', 'client'} & set(update_fields):
+        previous_client = getattr(instance, '_previous_client_id', None)
+        buckets = [
+            (instance.client_id, instance.issue_date),
+            (previous_client, getattr(instance, '_previous_issue_date', None)),
+        ]
+        if not update_fields:
+            # A full save may move the invoice to another client or cancel it;
+            # either way its payments' days change too.
+            for day in set(Payment.objects.filter(invoice=instance).values_list('payment_date', flat=True)):
+                buckets += [(instance.client_id, day), (previous_client, day)]
+        DailyRevenue.refresh(buckets)
+
+
+@receiver(post_save, sender=Client)
+def client_changed(sender, instance, **kwargs):
+    invalidate_snapshot(instance.organization_id)
+    DailyRevenue.objects.filter(client=instance).exclude(currency=instance.currency).update(
+        currency=instance.currency,
+    )
+
+
+@receiver(balances_changed)
+def dashboard_balances_changed(sender, invoices, **kwargs):
+    for organization_pk in {invoice.organization_id for invoice in invoices}:
+        invalidate_snapshot(organization_pk)
+
+
+def _payment_bucket(payment):
+    client_pk = Invoice.objects.filter(pk=payment.invoice_id).values_list('client_id', flat=True).first()
+    return client_pk, payment.payment_date
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_bucket(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._previous_bucket = (
+            Payment.objects.filter(pk=instance.pk).values_list('invoice__client_id', 'payment_date').first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    DailyRevenue.refresh([_payment_bucket(instance), getattr(instance, '_previous_bucket', None) or (None, None)])
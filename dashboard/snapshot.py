@@ -0,0 +1,97 @@
+"""
+Cached per-organization dashboard snapshot.
+
+The KPIs come from one conditional-aggregate query over the org's invoices,
+top clients from one grouped query over the same rows, and the result
+is cached per org and day (overdue styling depends on today's date). Invoice
+and payment writes drop the snapshot once they commit, and bump a per-org
+generation that keys the other cached reports (see aging.py); the short
+timeout covers the few bulk updates that skip signals (e.g. portal view
+flushes).
+"""
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+DASHBOARD_CACHE_TIMEOUT = 5 * 60
+RECENT_INVOICES = 8
+TOP_CLIENTS = 5
+
+
+def _key(organization_pk):
+    return f'dashboard:{organization_pk}:{date.today()}'
+
+
+def _generation_key(organization_pk):
+    return f'dashboard-org:{organization_pk}'
+
+
+def compute_snapshot(organization):
+    from clients.models import Client
+    from invoices.models import Invoice
+
+    invoices = Invoice.objects.filter(organization=organization)
+    balance = F('total') - F('amount_paid')
+    kpis = invoices.aggregate(
+        # Every invoice, drafts and cancelled ones included, as the dashboard has always shown.
+        total_invoiced=Sum('total'),
+        total_collected=Sum('amount_paid'),
+        total_outstanding=Sum(balance, filter=Q(status__in=Invoice.OPEN_STATUSES)),
+        total_overdue=Sum(balance, filter=Q(status=Invoice.STATUS_OVERDUE)),
+    )
+    recent = invoices.select_related('client').order_by('-created_at')[:RECENT_INVOICES]
+    return {
+        **{name: value or 0 for name, value in kpis.items()},
+        'recent_invoices': [
+            {
+                'pk': invoice.pk,
+                'invoice_number': invoice.invoice_number,
+                'client_name': invoice.client.name,
+                'total': invoice.total,
+                'due_date': invoice.due_date,
+                'is_overdue': invoice.is_overdue,
+                'status': invoice.status,
+                'status_display': invoice.get_status_display(),
+            }
+            for invoice in recent
+        ],
+        # Ranked by all their invoices like the KPI, not the ledger's issued-only total_invoiced.
+        'top_clients': list(
+            Client.objects.filter(organization=organization)
+            .values('pk', 'name', 'email')
+            .annotate(invoiced=Coalesce(Sum('invoices__total'), Value(Decimal('0'))))
+            .order_by('-invoiced', 'name')
+            .values('pk', 'name', 'email', total_invoiced=F('invoiced'))[:TOP_CLIENTS]
+        ),
+    }
+
+
+def get_snapshot(organization):
+    """The org's dashboard figures: one cache read unless something changed."""
+    key = _key(organization.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = compute_snapshot(organization)
+        cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def receivables_generation(organization_pk):
+    """Counter bumped on every receivables change; part of other report cache keys."""
+    return cache.get(_generation_key(organization_pk), 0)
+
+
+def invalidate_snapshot(organization_pk):
+    """Drop the org's snapshot and bump its generation once the current transaction commits."""
+    key = _key(organization_pk)
+    generation_key = _generation_key(organization_pk)
+
+    def invalidate():
+        cache.delete(key)
+        cache.add(generation_key, 0, timeout=None)
+        cache.incr(generation_key)
+
+    transaction.on_commit(invalidate, robust=True)
@@ -6,6 +6,7 @@ import os
 from pathlib import Path
 from decouple import config
 import dj_database_url  # ← needed for Render PostgreSQL
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +54,7 @@ INSTALLED_APPS = [
     'reminders',
     'dashboard',
     'notifications',
+    'search',
     'api_app',
 ]
 
@@ -192,10 +194,71 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'flush-portal-views': {
+        'task': 'invoices.tasks.flush_portal_views',
+        'schedule': 60.0,
+    },
+    'mark-overdue-invoices': {
+        'task': 'invoices.tasks.mark_overdue_invoices',
+        'schedule': crontab(minute=5),
+    },
+    'purge-pdf-exports': {
+        'task': 'invoices.tasks.purge_pdf_exports',
+        'schedule': crontab(minute=45),
+    },
+    'purge-tombstones': {
+        'task': 'api_app.tasks.purge_tombstones',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
 
 # In production (Render), tasks run via real workers — disable eager mode
 CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
 
+# ─── Cache ─────────────────────────────────────────────────────────────────────
+# Use Redis in production so web and worker processes share cached pages and
+# the portal view buffer; falls back to per-process memory locally.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    }
+
+# ─── Invoice PDF exports ───────────────────────────────────────────────────────
+# Exports up to this many invoices stream straight back in the response;
+# larger ones are built by a Celery worker and linked from a notification.
+# Those archives are downloadable by the same organization until they expire.
+PDF_EXPORT_INLINE_LIMIT = config('PDF_EXPORT_INLINE_LIMIT', default=200, cast=int)
+PDF_EXPORT_BATCH_SIZE = config('PDF_EXPORT_BATCH_SIZE', default=20, cast=int)
+PDF_EXPORT_RETENTION_HOURS = config('PDF_EXPORT_RETENTION_HOURS', default=24, cast=int)
+
+# ─── CSV / XLSX exports ────────────────────────────────────────────────────────
+# Rows fetched per database round trip (and flushed per XLSX chunk) while streaming.
+TABULAR_EXPORT_CHUNK_SIZE = config('TABULAR_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# ─── Invoice batch API ─────────────────────────────────────────────────────────
+# Most invoices accepted by one POST /api/invoices/batch/ request.
+INVOICE_BATCH_MAX_SIZE = config('INVOICE_BATCH_MAX_SIZE', default=500, cast=int)
+
+# ─── API change feed ───────────────────────────────────────────────────────────
+# Changes newer than this are held back for the next poll, so rows stamped just
+# before a slow commit are never skipped by a cursor that moved past them.
+CHANGE_FEED_SETTLE_SECONDS = config('CHANGE_FEED_SETTLE_SECONDS', default=5, cast=int)
+# Tombstones of deleted records are kept this long; older cursors must resync.
+CHANGE_FEED_RETENTION_DAYS = config('CHANGE_FEED_RETENTION_DAYS', default=90, cast=int)
+
+# ─── Client CSV import ─────────────────────────────────────────────────────────
+# Uploads up to this size import during the request; bigger files go to Celery.
+CLIENT_IMPORT_INLINE_BYTES = config('CLIENT_IMPORT_INLINE_BYTES', default=256 * 1024, cast=int)
+
 # ─── Email (SendGrid Web API — uses HTTP instead of SMTP, works on all hosts) ──
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='sendgrid_backend.SendgridBackend')
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
@@ -209,6 +272,10 @@ SITE_URL = config('SITE_URL', default='https://invoice-flow-moqa.onrender.com')
 STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+# Point at a local stand-in (e.g. stripe-mock on http://localhost:12111) for tests.
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='')
+# Lifetime of a reusable Checkout session (Stripe allows 30 minutes to 24 hours).
+STRIPE_CHECKOUT_SESSION_TTL = config('STRIPE_CHECKOUT_SESSION_TTL', default=60 * 60, cast=int)
 
 # ─── CORS ──────────────────────────────────────────────────────────────────────
 CORS_ALLOWED_ORIGINS = config(
@@ -21,6 +21,7 @@ urlpatterns = [
     path('organizations/', include('organizations.urls')),
     path('recurring/', include('recurring.urls')),
     path('notifications/', include('notifications.urls')),
+    path('search/', include('search.urls')),
 
     # REST API
     path('api/', include('api_app.urls')),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Invoice, InvoiceLineItem
+from .models import Invoice, InvoiceLineItem, InvoiceSequence
 
 
 class LineItemInline(admin.TabularInline):
@@ -22,3 +22,9 @@ class InvoiceAdmin(admin.ModelAdmin):
 class InvoiceLineItemAdmin(admin.ModelAdmin):
     list_display = ['invoice', 'description', 'quantity', 'unit_price', 'amount']
     readonly_fields = ['amount']
+
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'prefix', 'padding', 'next_number']
+    search_fields = ['organization__name']
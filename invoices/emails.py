@@ -0,0 +1,146 @@
+"""
+Invoice email rendering and dispatch. Called from Celery workers, never from
+the request path (see tasks.send_invoice_emails).
+"""
+import logging
+import uuid
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import Case, F, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+from clients.models import Client
+from dashboard.models import DailyRevenue
+from dashboard.snapshot import invalidate_snapshot
+from .models import Invoice
+
+logger = logging.getLogger(__name__)
+
+# Invoices per worker task — each task reuses one backend connection.
+SEND_BATCH_SIZE = 100
+
+UNSENDABLE_STATUSES = (Invoice.STATUS_CANCELLED, Invoice.STATUS_PAID)
+
+
+def build_invoice_email(invoice, connection=None):
+    """Render the invoice email (plain text + rich HTML) for the client."""
+    org = invoice.organization
+
+    # Always use the production URL for portal links (localhost triggers spam)
+    base_url = getattr(settings, 'SITE_URL', '').rstrip('/')
+    portal_url = f'{base_url}/invoices/portal/{invoice.pk}/'
+
+    subject = f'Invoice {invoice.invoice_number} from {org.name}'
+    ctx = {'invoice': invoice, 'org': org, 'portal_url': portal_url}
+
+    # Plain-text fallback
+    text_body = render_to_string('invoices/email_body.txt', ctx)
+    # Rich HTML invoice
+    html_body = render_to_string('invoices/email_invoice.html', ctx)
+
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[invoice.client.email],
+        reply_to=[settings.DEFAULT_FROM_EMAIL],
+        connection=connection,
+    )
+    email.attach_alternative(html_body, 'text/html')
+
+    # Anti-spam headers
+    email.extra_headers['X-Mailer'] = 'InvoiceFlow'
+    email.extra_headers['X-Entity-Ref-ID'] = str(invoice.pk)
+    return email
+
+
+def queue_invoice_emails(organization, invoice_pks):
+    """
+    Validate the selected invoices in one query and queue the sendable ones in
+    batches. Returns {invoice_pk: outcome}, keyed by canonical UUID string,
+    where outcome is 'queued', 'not_found', or the blocking status
+    ('cancelled' / 'paid').
+    """
+    from .tasks import send_invoice_emails
+
+    # Canonical ids, so case and hyphen variants of one invoice match and dedupe.
+    canonical = {}
+    for pk in invoice_pks:
+        try:
+            canonical[str(pk)] = str(uuid.UUID(str(pk)))
+        except ValueError:
+            pass
+    statuses = {
+        str(pk): status for pk, status in
+        Invoice.objects.filter(organization=organization, pk__in=set(canonical.values())).values_list('pk', 'status')
+    }
+    outcomes, sendable = {}, []
+    for pk in invoice_pks:
+        key = canonical.get(str(pk), str(pk))
+        if key in outcomes:
+            continue
+        status = statuses.get(key)
+        if status is None:
+            outcomes[key] = 'not_found'
+        elif status in UNSENDABLE_STATUSES:
+            outcomes[key] = status
+        else:
+            outcomes[key] = 'queued'
+            sendable.append(key)
+    for i in range(0, len(sendable), SEND_BATCH_SIZE):
+        send_invoice_emails.delay(sendable[i:i + SEND_BATCH_SIZE])
+    return outcomes
+
+
+def dispatch_invoice_emails(invoices, connection):
+    """
+    Send each invoice's email over one open backend connection, then close it.
+
+    Messages go out one at a time on the shared connection so a failure is
+    attributed to exactly one invoice and never re-sends the others.
+    Returns (sent, failed) lists of invoices; only sent ones are marked.
+    """
+    sent, failed = [], []
+    try:
+        for invoice in invoices:
+            try:
+                delivered = connection.send_messages([build_invoice_email(invoice, connection)])
+            except Exception:  # Provider/network error — retried by the caller
+                logger.exception('Sending the email for invoice %s failed', invoice.pk)
+                delivered = 0
+            (sent if delivered else failed).append(invoice)
+    finally:
+        connection.close()
+    mark_sent(sent)
+    return sent, failed
+
+
+def mark_sent(invoices):
+    """Record confirmed dispatch for the given invoices in one UPDATE."""
+    if not invoices:
+        return
+    from .portal import invalidate_pages
+
+    now = timezone.now()
+    # Delivery can lag the queueing by retries; only drafts move to sent, so an
+    # invoice viewed, paid or overdue in the meantime keeps its status.
+    Invoice.objects.filter(pk__in=[inv.pk for inv in invoices]).update(
+        status=Case(When(status=Invoice.STATUS_DRAFT, then=Value(Invoice.STATUS_SENT)), default=F('status')),
+        sent_at=now, updated_at=now,
+    )
+    for invoice in invoices:
+        if invoice.status == Invoice.STATUS_DRAFT:
+            invoice.status = Invoice.STATUS_SENT
+        invoice.sent_at = now
+    # Status-only change: the cached PDF re-renders on its next download.
+    invalidate_pages([invoice.pk for invoice in invoices])
+    # Drafts start counting towards the clients' invoiced and outstanding totals.
+    Client.apply_invoice_changes(invoice.pop_ledger_change() for invoice in invoices)
+    for organization_pk in {invoice.organization_id for invoice in invoices}:
+        invalidate_snapshot(organization_pk)
+    # Issued now, so the invoices and any payments already on them count.
+    from payments.models import Payment
+    payment_days = Payment.objects.filter(invoice__in=[inv.pk for inv in invoices]).values_list(
+        'invoice__client', 'payment_date',
+    ).distinct()
+    DailyRevenue.refresh([(invoice.client_id, invoice.issue_date) for invoice in invoices] + list(payment_days))
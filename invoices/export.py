@@ -0,0 +1,276 @@
+"""
+Bulk exports — renders many invoices into a single ZIP archive of PDFs, and
+streams list-view rows as CSV or XLSX, without holding the archive or the
+table (or more than one batch of rows) in memory.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .pdf import read_or_render_pdf
+
+
+def iter_invoice_pdfs(invoices, progress=None):
+    """
+    Yield (filename, pdf_bytes) for each invoice in order.
+
+    Rendering happens in this process: cached PDFs are read from storage and
+    misses are rendered and written back to the cache. `progress` is called
+    with the running count after every batch of PDF_EXPORT_BATCH_SIZE.
+    """
+    batch_size = settings.PDF_EXPORT_BATCH_SIZE
+    qs = invoices.select_related('client', 'organization').prefetch_related('line_items')
+    done = 0
+    for invoice in qs.iterator(chunk_size=batch_size):
+        yield f'{invoice.invoice_number}.pdf', read_or_render_pdf(invoice)
+        done += 1
+        if progress and done % batch_size == 0:
+            progress(done)
+    if progress and done % batch_size:
+        progress(done)
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """Yield a ZIP archive of (filename, bytes) entries chunk by chunk."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in entries:
+            archive.writestr(filename, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_zip(entries, fileobj):
+    """Write a ZIP archive of (filename, bytes) entries to an open binary file."""
+    for chunk in stream_zip(entries):
+        fileobj.write(chunk)
+
+
+def export_archive_name(organization_pk, token):
+    """Storage path of a background PDF export; only served through an org-checked view."""
+    return f'exports/{organization_pk}/invoices-{token}.zip'
+
+
+def export_expired(name):
+    cutoff = timezone.now() - timedelta(hours=settings.PDF_EXPORT_RETENTION_HOURS)
+    return default_storage.get_modified_time(name) < cutoff
+
+
+def purge_expired_exports():
+    """Delete background PDF exports older than PDF_EXPORT_RETENTION_HOURS."""
+    try:
+        org_dirs, files = default_storage.listdir('exports')
+    except FileNotFoundError:
+        return 0
+    # Top-level files are archives written before exports were kept per organization.
+    names = [f'exports/{filename}' for filename in files]
+    for org_dir in org_dirs:
+        _, files = default_storage.listdir(f'exports/{org_dir}')
+        names.extend(f'exports/{org_dir}/{filename}' for filename in files)
+    expired = [name for name in names if export_expired(name)]
+    for name in expired:
+        default_storage.delete(name)
+    return len(expired)
+
+
+# ─── Tabular (CSV / XLSX) ──────────────────────────────────────────────────────
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _export_rows(queryset, columns):
+    """Raw value tuples for `columns` ([(header, lookup), ...]), fetched in chunks."""
+    lookups = [lookup for _, lookup in columns]
+    return queryset.values_list(*lookups).iterator(chunk_size=settings.TABULAR_EXPORT_CHUNK_SIZE)
+
+
+def _plain(value):
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+class _Echo:
+    """csv.writer target that hands back each formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    value = _plain(value)
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value  # Keep spreadsheet apps from evaluating it as a formula.
+    return value
+
+
+def stream_csv(columns, rows):
+    """Yield a UTF-8 CSV (with BOM, for Excel) one chunk of rows at a time."""
+    writer = csv.writer(_Echo())
+    lines = ['\ufeff' + writer.writerow([header for header, _ in columns])]
+    for row in rows:
+        lines.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(lines) >= settings.TABULAR_EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+_XLSX_EPOCH = datetime(1899, 12, 30)
+# cellXfs indexes in _XLSX_STYLES.
+_XLSX_DATE_STYLE = 1
+_XLSX_DATETIME_STYLE = 2
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+# Control characters XML 1.0 forbids; Excel refuses a workbook containing them.
+_XML_ILLEGAL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    value = _plain(value)
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        serial = (value - _XLSX_EPOCH).total_seconds() / 86400
+        return f'<c s="{_XLSX_DATETIME_STYLE}"><v>{serial:.6f}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_XLSX_DATE_STYLE}"><v>{(value - _XLSX_EPOCH.date()).days}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(columns, rows, sheet_name='Sheet1'):
+    """
+    Yield an XLSX workbook chunk by chunk. Cells use inline strings rather
+    than a shared-strings table, so each row is written out as soon as it
+    is read and nothing accumulates across rows.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _XLSX_STYLES)
+        yield sink.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(('<row>' + ''.join(_xlsx_cell(h) for h, _ in columns) + '</row>').encode())
+            for i, row in enumerate(rows, start=1):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode())
+                if i % settings.TABULAR_EXPORT_CHUNK_SIZE == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def tabular_response(queryset, columns, filename, export_format):
+    """StreamingHttpResponse of the queryset as `<filename>.csv` or `.xlsx`."""
+    return rows_response(columns, _export_rows(queryset, columns), filename, export_format)
+
+
+def rows_response(columns, rows, filename, export_format):
+    """StreamingHttpResponse of already-fetched row tuples as CSV or XLSX."""
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(columns, rows, filename), content_type=XLSX_CONTENT_TYPE)
+    else:
+        export_format = 'csv'
+        response = StreamingHttpResponse(stream_csv(columns, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{date.today()}.{export_format}"'
+    return response
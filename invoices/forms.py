@@ -1,4 +1,6 @@
+from functools import partial
 from django import forms
+from django.core.exceptions import ValidationError
 from .models import Invoice, InvoiceLineItem
 from clients.models import Client
 
@@ -37,9 +39,45 @@ class LineItemForm(forms.ModelForm):
         }
 
 
+class BaseLineItemFormSet(forms.BaseInlineFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Resolve posted line item ids against the formset's single preloaded
+        # queryset instead of running one SELECT per form.
+        field = form.fields[self._pk_field.name]
+        field.to_python = partial(self._existing_item, field)
+
+    def _existing_item(self, field, value):
+        if value in field.empty_values:
+            return None
+        try:
+            item = self._existing_object(self.model._meta.pk.to_python(value))
+        except ValidationError:
+            item = None
+        if item is None:
+            raise ValidationError(field.error_messages['invalid_choice'], code='invalid_choice')
+        return item
+
+    def save_bulk(self):
+        """Save the invoice and all its line items via Invoice.save_line_items."""
+        kept, deleted = [], []
+        for form in self.forms:
+            is_new = form.instance._state.adding
+            if is_new and not form.has_changed():
+                continue  # Untouched extra form
+            if self.can_delete and self._should_delete_form(form):
+                if not is_new:
+                    deleted.append(form.instance)
+                continue
+            kept.append(form.save(commit=False))
+        self.instance.save_line_items(kept, deleted)
+        return kept
+
+
 LineItemFormSet = forms.inlineformset_factory(
     Invoice, InvoiceLineItem,
     form=LineItemForm,
+    formset=BaseLineItemFormSet,
     extra=1,
     can_delete=True,
     min_num=1,
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0001_initial'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(default='INV-', max_length=20)),
+                ('padding', models.PositiveSmallIntegerField(default=4, help_text='Minimum digits, zero-padded')),
+                ('next_number', models.PositiveIntegerField(default=1)),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequence', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Invoice Sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_client_list_indexes'),
+        ('invoices', '0004_invoice_status_due_idx'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', 'created_at'], name='invoice_client_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_client_change_feed_idx'),
+        ('invoices', '0005_invoice_client_created_idx'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='invoice_org_updated_idx'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from organizations.models import Organization
 from clients.models import Client
@@ -26,6 +26,10 @@ class Invoice(models.Model):
         (STATUS_OVERDUE, 'Overdue'),
         (STATUS_CANCELLED, 'Cancelled'),
     ]
+    # Outstanding statuses that become overdue once due_date has passed.
+    OVERDUE_FROM_STATUSES = (STATUS_SENT, STATUS_VIEWED, STATUS_PARTIALLY_PAID)
+    # Issued invoices that still have a balance to collect.
+    OPEN_STATUSES = OVERDUE_FROM_STATUSES + (STATUS_OVERDUE,)
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     organization = models.ForeignKey(
@@ -56,10 +60,47 @@ class Invoice(models.Model):
         verbose_name = 'Invoice'
         ordering = ['-created_at']
         unique_together = ('organization', 'invoice_number')
+        indexes = [
+            models.Index(fields=['organization', 'created_at'], name='invoice_org_created_idx'),
+            models.Index(fields=['organization', 'status', 'created_at'], name='invoice_org_status_created_idx'),
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+            models.Index(fields=['client', 'created_at'], name='invoice_client_created_idx'),
+            models.Index(fields=['organization', 'updated_at', 'id'], name='invoice_org_updated_idx'),
+        ]
+
+    # Columns the client ledger and revenue rollups derive from, as last read
+    # from or written to the database (None until then); receivers diff the
+    # instance against them instead of re-reading the row.
+    SAVED_STATE_FIELDS = ('client_id', 'issue_date', 'status', 'total', 'amount_paid')
+    _saved_state = None
 
     def __str__(self):
         return f'{self.invoice_number} — {self.client.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        invoice = super().from_db(db, field_names, values)
+        invoice.remember_saved_state()
+        return invoice
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_saved_state()
+
+    def remember_saved_state(self):
+        if not set(self.SAVED_STATE_FIELDS) & self.get_deferred_fields():
+            self._saved_state = {name: getattr(self, name) for name in self.SAVED_STATE_FIELDS}
+
+    def ledger_state(self):
+        return self.client_id, self.status, self.total, self.amount_paid
+
+    def pop_ledger_change(self):
+        """(before, after) ledger states since the last read or write; marks the current state saved."""
+        saved = self._saved_state
+        before = saved and (saved['client_id'], saved['status'], saved['total'], saved['amount_paid'])
+        self.remember_saved_state()
+        return before, self.ledger_state()
+
     @property
     def balance_due(self):
         return max(self.total - self.amount_paid, 0)
@@ -72,9 +113,8 @@ class Invoice(models.Model):
             and self.due_date < date.today()
         )
 
-    def recalculate_totals(self):
-        """Recompute subtotal, tax, and total from line items."""
-        items = self.line_items.all()
+    def apply_totals(self, items):
+        """Set subtotal, tax, and total from in-memory line items (no query)."""
         subtotal = sum(item.amount for item in items)
         tax_amount = sum(
             item.amount * (item.tax_rate / 100) for item in items
@@ -82,20 +122,254 @@ class Invoice(models.Model):
         self.subtotal = subtotal
         self.tax_amount = tax_amount
         self.total = subtotal + tax_amount - self.discount_amount
+
+    def recalculate_totals(self):
+        """Recompute subtotal, tax, and total from line items."""
+        self.apply_totals(self.line_items.all())
         self.save(update_fields=['subtotal', 'tax_amount', 'total'])
 
+    def save_line_items(self, items, deleted=()):
+        """
+        Persist the invoice's complete set of line items in bulk and store totals.
+
+        `items` is every line item the invoice should end up with — unsaved ones
+        are inserted, existing ones updated; `deleted` ones are removed. Costs a
+        constant number of queries however many lines the invoice has.
+        """
+        items = list(items)
+        for item in items:
+            item.invoice = self
+            item.compute_amount()
+        self.apply_totals(items)
+        with transaction.atomic():
+            if self._state.adding:
+                self.save()
+            else:
+                self.save(update_fields=['subtotal', 'tax_amount', 'total', 'updated_at'])
+
+            deleted_pks = [item.pk for item in deleted if not item._state.adding]
+            if deleted_pks:
+                InvoiceLineItem.objects.filter(invoice=self, pk__in=deleted_pks).delete()
+            new = [item for item in items if item._state.adding]
+            existing = [item for item in items if not item._state.adding]
+            if new:
+                InvoiceLineItem.objects.bulk_create(new)
+            if existing:
+                InvoiceLineItem.objects.bulk_update(existing, InvoiceLineItem.EDITABLE_FIELDS)
+
+    @classmethod
+    def create_batch(cls, organization, entries):
+        """
+        Insert many new invoices at once. `entries` is a list of (invoice,
+        line_items) pairs of unsaved instances: numbers are reserved in one
+        block, totals computed in memory and both tables written with
+        bulk_create. That skips post_save, so the client ledgers, revenue
+        rollups, dashboard and search index are brought up to date here.
+        Returns the created invoices in order.
+        """
+        from datetime import date, timedelta
+        if not entries:
+            return []
+        invoices, line_items = [], []
+        with transaction.atomic():
+            numbers = InvoiceSequence.reserve(organization, len(entries))
+            for (invoice, items), number in zip(entries, numbers):
+                invoice.organization = organization
+                invoice.invoice_number = number
+                invoice.issue_date = invoice.issue_date or date.today()
+                if not invoice.due_date:
+                    invoice.due_date = invoice.issue_date + timedelta(days=organization.payment_terms)
+                for item in items:
+                    item.invoice = invoice
+                    item.compute_amount()
+                invoice.apply_totals(items)
+                invoices.append(invoice)
+                line_items.extend(items)
+            cls.objects.bulk_create(invoices, batch_size=500)
+            InvoiceLineItem.objects.bulk_create(line_items, batch_size=1000)
+
+            from dashboard.models import DailyRevenue
+            from dashboard.snapshot import invalidate_snapshot
+            from search.backends import index_invoices
+            Client.apply_invoice_changes(invoice.pop_ledger_change() for invoice in invoices)
+            DailyRevenue.refresh({(invoice.client_id, invoice.issue_date) for invoice in invoices})
+            invalidate_snapshot(organization.pk)
+            transaction.on_commit(lambda: index_invoices(invoices), robust=True)
+        # PDFs are not queued: the download view renders any missing one on demand.
+        return invoices
+
+    @classmethod
+    def mark_overdue(cls, today=None, batch_size=500):
+        """
+        Move outstanding invoices past their due date to overdue, one chunked
+        UPDATE at a time. Returns {organization_id: [invoice_number, ...]} for
+        the invoices that changed; running it again is a no-op.
+        """
+        from datetime import date
+        today = today or date.today()
+        due = cls.objects.filter(status__in=cls.OVERDUE_FROM_STATUSES, due_date__lt=today)
+        changed = {}
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    due.select_for_update()
+                    .order_by('due_date', 'pk')
+                    .values_list('pk', 'organization_id', 'client_id', 'invoice_number', 'total', 'amount_paid')
+                    [:batch_size]
+                )
+                if not rows:
+                    break
+                cls.objects.filter(pk__in=[row[0] for row in rows]).update(
+                    status=cls.STATUS_OVERDUE, updated_at=timezone.now(),
+                )
+                from clients.models import Client
+                from dashboard.snapshot import invalidate_snapshot
+                # Still open, so only the overdue balance moves.
+                overdue = {}
+                for _, _, client_pk, _, total, amount_paid in rows:
+                    overdue[client_pk] = overdue.get(client_pk, 0) + total - amount_paid
+                Client.apply_ledger_deltas({pk: {'overdue_balance': amount} for pk, amount in overdue.items()})
+                for organization_id in {row[1] for row in rows}:
+                    invalidate_snapshot(organization_id)
+            for _, organization_id, _, number, _, _ in rows:
+                changed.setdefault(organization_id, []).append(number)
+            # Cached PDFs are keyed on status, so they re-render on next download.
+            from .portal import invalidate_pages
+            invalidate_pages([row[0] for row in rows])
+        return changed
+
+    @classmethod
+    def filtered(cls, organization, status='', q=''):
+        """Org invoices narrowed by the list view's status tab and search box."""
+        qs = cls.objects.filter(organization=organization).select_related('client')
+        if status:
+            qs = qs.filter(status=status)
+        if q:
+            from search.backends import matching_ids
+            from search.models import SearchDocument
+            # Document terms match by prefix; invoice numbers also match anywhere,
+            # so "0012" still finds INV-0012.
+            qs = qs.filter(
+                models.Q(pk__in=matching_ids(organization, SearchDocument.KIND_INVOICE, q))
+                | models.Q(client__in=matching_ids(organization, SearchDocument.KIND_CLIENT, q))
+                | models.Q(invoice_number__icontains=q)
+            )
+        return qs
+
+    def status_for_amount_paid(self, amount_paid):
+        """Lifecycle status the invoice should have once `amount_paid` is recorded."""
+        from datetime import date
+        if self.status not in self.OPEN_STATUSES + (self.STATUS_PAID,):
+            # Drafts and cancelled invoices keep their status; the amount is still recorded.
+            return self.status
+        past_due = self.due_date < date.today()
+        if amount_paid > 0 and amount_paid >= self.total:
+            return self.STATUS_PAID
+        if amount_paid > 0:
+            return self.STATUS_OVERDUE if past_due else self.STATUS_PARTIALLY_PAID
+        if self.status in (self.STATUS_PAID, self.STATUS_PARTIALLY_PAID):
+            # Payments were removed or refunded: reopen the invoice.
+            if past_due:
+                return self.STATUS_OVERDUE
+            return self.STATUS_VIEWED if self.viewed_at else self.STATUS_SENT
+        return self.status
+
+    @classmethod
+    def apply_payment(cls, invoice_pk, delta):
+        """
+        Add `delta` (negative for deletes and refunds) to the invoice's
+        amount_paid and move its status accordingly, under a row lock so
+        concurrent payments never overwrite each other. Call inside a transaction.
+        """
+        invoice = cls.objects.select_for_update().filter(pk=invoice_pk).first()
+        if invoice is None or not delta:
+            return invoice
+        cls.objects.filter(pk=invoice_pk).update(amount_paid=models.F('amount_paid') + delta)
+        invoice.amount_paid += delta
+        invoice.status = invoice.status_for_amount_paid(invoice.amount_paid)
+        # Saved normally (amount_paid is already written) so post_save receivers run.
+        invoice.save(update_fields=['status', 'updated_at'])
+        return invoice
+
+    @classmethod
+    def apply_payments(cls, deltas):
+        """
+        Bulk form of apply_payment: add each {invoice_pk: delta} to amount_paid
+        and move statuses in one locked batch, then send balances_changed.
+        Call inside a transaction; returns the updated invoices.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return []
+        invoices = list(cls.objects.select_for_update().filter(pk__in=list(deltas)).order_by('pk'))
+        now = timezone.now()
+        for invoice in invoices:
+            invoice.amount_paid += deltas[invoice.pk]
+            invoice.status = invoice.status_for_amount_paid(invoice.amount_paid)
+            invoice.updated_at = now
+        cls.objects.bulk_update(invoices, ['amount_paid', 'status', 'updated_at'], batch_size=500)
+        from .signals import balances_changed
+        balances_changed.send(sender=cls, invoices=invoices)
+        return invoices
+
     @classmethod
     def generate_invoice_number(cls, organization):
-        """Auto-generate sequential invoice number per org (INV-0001)."""
-        last = cls.objects.filter(organization=organization).order_by('-created_at').first()
-        if last and last.invoice_number.startswith('INV-'):
-            try:
-                num = int(last.invoice_number.split('-')[1]) + 1
-            except (IndexError, ValueError):
-                num = 1
-        else:
-            num = 1
-        return f'INV-{num:04d}'
+        """Allocate the next sequential invoice number for the org (INV-0001)."""
+        return InvoiceSequence.reserve(organization)[0]
+
+
+class InvoiceSequence(models.Model):
+    """
+    Per-organization invoice number counter. Numbers are handed out under a
+    row lock, so concurrent creates never collide on invoice_number.
+    """
+    organization = models.OneToOneField(
+        Organization, on_delete=models.CASCADE, related_name='invoice_sequence',
+    )
+    prefix = models.CharField(max_length=20, default='INV-')
+    padding = models.PositiveSmallIntegerField(default=4, help_text='Minimum digits, zero-padded')
+    next_number = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Invoice Sequence'
+
+    def __str__(self):
+        return f'{self.organization.name}: next {self.format(self.next_number)}'
+
+    def format(self, number):
+        return f'{self.prefix}{number:0{self.padding}d}'
+
+    @classmethod
+    def reserve(cls, organization, count=1):
+        """Atomically reserve `count` consecutive invoice numbers for an org."""
+        with transaction.atomic():
+            seq = cls.objects.select_for_update().filter(organization=organization).first()
+            if seq is None:
+                seq = cls._create_for(organization)
+            start = seq.next_number
+            seq.next_number = start + count
+            seq.save(update_fields=['next_number'])
+        return [seq.format(n) for n in range(start, start + count)]
+
+    @classmethod
+    def _create_for(cls, organization):
+        # First allocation for this org: continue after any numbers issued
+        # before the sequence existed. Runs once per organization.
+        prefix = cls._meta.get_field('prefix').default
+        highest = 0
+        numbers = Invoice.objects.filter(
+            organization=organization, invoice_number__startswith=prefix,
+        ).values_list('invoice_number', flat=True)
+        for number in numbers.iterator():
+            suffix = number[len(prefix):]
+            if suffix.isdigit():
+                highest = max(highest, int(suffix))
+        try:
+            with transaction.atomic():
+                return cls.objects.create(organization=organization, next_number=highest + 1)
+        except IntegrityError:
+            # Another request created it first — lock theirs instead.
+            return cls.objects.select_for_update().get(organization=organization)
 
 
 class InvoiceLineItem(models.Model):
@@ -114,6 +388,8 @@ class InvoiceLineItem(models.Model):
                                    help_text='Discount percentage')
     amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    EDITABLE_FIELDS = ['description', 'quantity', 'unit_price', 'tax_rate', 'discount', 'amount']
+
     class Meta:
         verbose_name = 'Invoice Line Item'
         ordering = ['id']
@@ -121,9 +397,13 @@ class InvoiceLineItem(models.Model):
     def __str__(self):
         return f'{self.description} × {self.quantity}'
 
-    def save(self, *args, **kwargs):
-        # Compute amount: qty × unit_price × (1 - discount%) 
+    def compute_amount(self):
+        # Compute amount: qty × unit_price × (1 - discount%)
         base = self.quantity * self.unit_price
         base_after_discount = base * (1 - self.discount / 100)
         self.amount = round(base_after_discount, 2)
+        return self.amount
+
+    def save(self, *args, **kwargs):
+        self.compute_amount()
         super().save(*args, **kwargs)
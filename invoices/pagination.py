@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination for HTML list views.
+
+Pages are addressed by the sort key of the last/first row shown rather than
+an OFFSET, so fetching page 500 costs the same index range scan as page 1.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def _encode(values):
+    raw = json.dumps([str(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(model, fields, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(fields):
+            return None
+        return [model._meta.get_field(f).to_python(v) for f, v in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _seek(ordering, values, forward):
+    """Q matching rows strictly after (or before) `values` in `ordering`."""
+    condition = Q()
+    for i, term in enumerate(ordering):
+        field = term.lstrip('-')
+        descending = term.startswith('-')
+        op = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{field}__{op}': values[i]})
+        for prev_term, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_term.lstrip('-'): prev_value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, request, ordering, per_page=50):
+    """
+    Return one KeysetPage of `queryset` ordered by `ordering` (the last term
+    must be unique, e.g. the primary key). Reads `?after=` / `?before=`.
+    """
+    ordering = list(ordering)
+    fields = [term.lstrip('-') for term in ordering]
+    model = queryset.model
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+
+    forward = True
+    qs = queryset.order_by(*ordering)
+    if after and (values := _decode(model, fields, after)):
+        qs = qs.filter(_seek(ordering, values, forward=True))
+    elif before and (values := _decode(model, fields, before)):
+        forward = False
+        reverse = [term[1:] if term.startswith('-') else f'-{term}' for term in ordering]
+        qs = queryset.order_by(*reverse).filter(_seek(ordering, values, forward=False))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key(obj):
+        return _encode([getattr(obj, f) for f in fields])
+
+    if not rows:
+        return KeysetPage(rows, None, None)
+    if forward:
+        next_cursor = key(rows[-1]) if has_more else None
+        prev_cursor = key(rows[0]) if after else None
+    else:
+        next_cursor = key(rows[-1])
+        prev_cursor = key(rows[0]) if has_more else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
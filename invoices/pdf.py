@@ -0,0 +1,202 @@
+"""
+PDF rendering and content-addressed caching for invoices.
+"""
+import hashlib
+import io
+from django.core.files.base import ContentFile
+
+# Bump when the ReportLab layout below changes so every cached PDF is re-rendered.
+PDF_LAYOUT_VERSION = 1
+
+# Invoice fields pdf_fingerprint reads, besides line items and client/org details.
+# Status is printed too, but status-only saves (payments, overdue sweeps) leave the
+# cached copy to re-render on its next download rather than queueing a render.
+PDF_CONTENT_FIELDS = frozenset({
+    'invoice_number', 'issue_date', 'due_date', 'subtotal', 'discount_amount',
+    'tax_amount', 'total', 'notes', 'terms', 'client', 'client_id',
+})
+
+
+def pdf_fingerprint(invoice, org):
+    """SHA-256 over everything that ends up on the rendered PDF."""
+    client = invoice.client
+    parts = [
+        f'v{PDF_LAYOUT_VERSION}', str(invoice.pk), invoice.invoice_number,
+        invoice.get_status_display(), str(invoice.issue_date), str(invoice.due_date),
+        str(invoice.subtotal), str(invoice.discount_amount), str(invoice.tax_amount),
+        str(invoice.total), invoice.notes, invoice.terms,
+        client.name, client.email, client.billing_address,
+        org.name, org.address, org.phone, org.logo.name or '',
+    ]
+    for item in invoice.line_items.all():
+        parts.extend([
+            item.description, str(item.quantity), str(item.unit_price),
+            str(item.tax_rate), str(item.discount), str(item.amount),
+        ])
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def pdf_filename(fingerprint):
+    """Storage path of the cached PDF for a fingerprint (matches pdf_file's upload_to)."""
+    return f'invoices/pdfs/{fingerprint}.pdf'
+
+
+def has_cached_pdf(invoice, fingerprint):
+    return invoice.pdf_file.name == pdf_filename(fingerprint)
+
+
+def store_pdf(invoice, fingerprint, pdf_bytes):
+    """Persist rendered bytes under their fingerprint and point invoice.pdf_file at them."""
+    from .models import Invoice
+
+    storage = invoice.pdf_file.storage
+    name = pdf_filename(fingerprint)
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(pdf_bytes))
+    previous = invoice.pdf_file.name
+    # Queryset update: no post_save signal, so storing never re-queues a render.
+    Invoice.objects.filter(pk=invoice.pk).update(pdf_file=name)
+    invoice.pdf_file.name = name
+    if previous and previous != name and storage.exists(previous):
+        storage.delete(previous)
+    return name
+
+
+def refresh_pdf(invoice):
+    """Render and store the invoice PDF unless the cached copy is still current."""
+    org = invoice.organization
+    fingerprint = pdf_fingerprint(invoice, org)
+    if not has_cached_pdf(invoice, fingerprint):
+        store_pdf(invoice, fingerprint, generate_pdf(invoice, org))
+    return fingerprint
+
+
+def read_or_render_pdf(invoice, fingerprint=None):
+    """
+    The invoice's PDF bytes: the cached copy when it is current and readable,
+    otherwise a fresh render that is stored back under its fingerprint.
+    """
+    org = invoice.organization
+    if fingerprint is None:
+        fingerprint = pdf_fingerprint(invoice, org)
+    if has_cached_pdf(invoice, fingerprint):
+        try:
+            with invoice.pdf_file.open('rb') as f:
+                return f.read()
+        except OSError:
+            pass  # File went missing from storage — treat as a cache miss
+    pdf_bytes = generate_pdf(invoice, org)
+    store_pdf(invoice, fingerprint, pdf_bytes)
+    return pdf_bytes
+
+
+def generate_pdf(invoice, org):
+    """Generate a PDF invoice using ReportLab."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm,
+                            topMargin=20*mm, bottomMargin=20*mm)
+    styles = getSampleStyleSheet()
+    primary = colors.HexColor('#4f46e5')
+    story = []
+
+    # Header
+    header_data = [
+        [Paragraph(f'<font size="22" color="#4f46e5"><b>InvoiceFlow</b></font>', styles['Normal']),
+         Paragraph(f'<font size="18"><b>INVOICE</b></font><br/>'
+                   f'<font size="10" color="grey">{invoice.invoice_number}</font>', styles['Normal'])]
+    ]
+    header_table = Table(header_data, colWidths=[100*mm, 70*mm])
+    header_table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ]))
+    story.append(header_table)
+    story.append(Spacer(1, 10*mm))
+
+    # Org / Client info
+    info_data = [
+        [Paragraph(f'<b>{org.name}</b><br/>{org.address or ""}<br/>{org.phone or ""}', styles['Normal']),
+         Paragraph(f'<b>Bill To:</b><br/>{invoice.client.name}<br/>{invoice.client.email}<br/>'
+                   f'{invoice.client.billing_address or ""}', styles['Normal'])]
+    ]
+    info_table = Table(info_data, colWidths=[90*mm, 80*mm])
+    story.append(info_table)
+    story.append(Spacer(1, 8*mm))
+
+    # Dates
+    dates_data = [
+        ['Issue Date', str(invoice.issue_date)],
+        ['Due Date', str(invoice.due_date)],
+        ['Status', invoice.get_status_display()],
+    ]
+    dates_table = Table(dates_data, colWidths=[50*mm, 50*mm])
+    dates_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+        ('PADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(dates_table)
+    story.append(Spacer(1, 10*mm))
+
+    # Line items
+    item_data = [['Description', 'Qty', 'Unit Price', 'Tax %', 'Discount %', 'Amount']]
+    for item in invoice.line_items.all():
+        item_data.append([
+            item.description,
+            str(item.quantity),
+            f'${item.unit_price:.2f}',
+            f'{item.tax_rate}%',
+            f'{item.discount}%',
+            f'${item.amount:.2f}',
+        ])
+    items_table = Table(item_data, colWidths=[80*mm, 18*mm, 26*mm, 18*mm, 22*mm, 22*mm])
+    items_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), primary),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+        ('PADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(items_table)
+    story.append(Spacer(1, 8*mm))
+
+    # Totals
+    totals_data = [
+        ['Subtotal', f'${invoice.subtotal:.2f}'],
+        ['Discount', f'-${invoice.discount_amount:.2f}'],
+        ['Tax', f'${invoice.tax_amount:.2f}'],
+        ['TOTAL DUE', f'${invoice.total:.2f}'],
+    ]
+    totals_table = Table(totals_data, colWidths=[120*mm, 30*mm])
+    totals_table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, -1), (-1, -1), 13),
+        ('BACKGROUND', (0, -1), (-1, -1), primary),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, primary),
+        ('PADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(totals_table)
+
+    if invoice.notes:
+        story.append(Spacer(1, 10*mm))
+        story.append(Paragraph(f'<b>Notes:</b> {invoice.notes}', styles['Normal']))
+    if invoice.terms:
+        story.append(Spacer(1, 4*mm))
+        story.append(Paragraph(f'<b>Terms:</b> {invoice.terms}', styles['Normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
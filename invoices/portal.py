@@ -0,0 +1,131 @@
+"""
+Caching for the public invoice portal and write-behind view tracking.
+
+Rendered portal pages are cached per invoice (and per day, since overdue
+styling depends on today's date). Organization branding changes bump a
+per-org generation so every cached page for that org is discarded at once.
+
+First views are not written on the request path: record_view() appends the
+invoice to a buffer in the cache and flush_views() (run by Celery beat, or
+early once a batch fills up) applies them all with one UPDATE per batch.
+The buffer must live in a cache shared by web and worker processes (Redis —
+see CACHE_URL in settings).
+"""
+import hashlib
+from datetime import date, datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from .models import Invoice
+
+PORTAL_CACHE_TIMEOUT = 60 * 60
+VIEW_FLUSH_BATCH_SIZE = 500
+
+_VIEW_SEQ_KEY = 'invoice-portal-views:seq'
+_VIEW_FLUSHED_KEY = 'invoice-portal-views:flushed'
+_VIEW_FLUSH_LOCK = 'invoice-portal-views:lock'
+
+
+def _page_key(invoice_pk):
+    return f'invoice-portal:{invoice_pk}:{date.today()}'
+
+
+def _org_generation_key(organization_pk):
+    return f'invoice-portal-org:{organization_pk}'
+
+
+def _view_slot_key(slot):
+    return f'invoice-portal-views:{slot}'
+
+
+def _view_pending_key(invoice_pk):
+    return f'invoice-portal-viewed:{invoice_pk}'
+
+
+def get_cached_page(invoice_pk):
+    """Cached portal page dict (html, etag, track_view) or None on a miss."""
+    page = cache.get(_page_key(invoice_pk))
+    if page is None:
+        return None
+    if cache.get(_org_generation_key(page['organization_id']), 0) != page['org_generation']:
+        return None
+    return page
+
+
+def cache_page(invoice, html):
+    page = {
+        'html': html,
+        'etag': '"%s"' % hashlib.sha256(html.encode('utf-8')).hexdigest(),
+        'organization_id': str(invoice.organization_id),
+        'org_generation': cache.get(_org_generation_key(invoice.organization_id), 0),
+        'track_view': invoice.status == Invoice.STATUS_SENT and not invoice.viewed_at,
+    }
+    cache.set(_page_key(invoice.pk), page, PORTAL_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_page(invoice_pk):
+    cache.delete(_page_key(invoice_pk))
+
+
+def invalidate_pages(invoice_pks):
+    cache.delete_many([_page_key(pk) for pk in invoice_pks])
+
+
+def invalidate_organization(organization_pk):
+    key = _org_generation_key(organization_pk)
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def record_view(invoice_pk):
+    """Buffer a first view of a sent invoice; flush_views() persists it."""
+    # Dedupe until flushed; the timeout lets a view lost to a cache eviction be re-recorded.
+    if not cache.add(_view_pending_key(invoice_pk), 1, timeout=10 * 60):
+        return
+    cache.add(_VIEW_SEQ_KEY, 0, timeout=None)
+    slot = cache.incr(_VIEW_SEQ_KEY)
+    cache.set(_view_slot_key(slot), (str(invoice_pk), timezone.now().timestamp()), timeout=24 * 60 * 60)
+    if slot % VIEW_FLUSH_BATCH_SIZE == 0:
+        from .tasks import flush_portal_views
+        flush_portal_views.delay()
+
+
+def flush_views():
+    """Apply buffered portal views: sent → viewed with the first view time."""
+    if not cache.add(_VIEW_FLUSH_LOCK, 1, timeout=60):
+        return 0
+    try:
+        end = cache.get(_VIEW_SEQ_KEY, 0)
+        start = cache.get(_VIEW_FLUSHED_KEY, 0)
+        flushed = 0
+        while start < end:
+            stop = min(start + VIEW_FLUSH_BATCH_SIZE, end)
+            keys = [_view_slot_key(slot) for slot in range(start + 1, stop + 1)]
+            flushed += _apply_views(cache.get_many(keys).values())
+            cache.set(_VIEW_FLUSHED_KEY, stop, timeout=None)
+            cache.delete_many(keys)
+            start = stop
+        return flushed
+    finally:
+        cache.delete(_VIEW_FLUSH_LOCK)
+
+
+def _apply_views(entries):
+    first_seen = {}
+    for invoice_pk, ts in entries:
+        first_seen[invoice_pk] = min(ts, first_seen.get(invoice_pk, ts))
+    if not first_seen:
+        return 0
+    viewed_at = Case(
+        *[When(pk=pk, then=Value(datetime.fromtimestamp(ts, tz=dt_timezone.utc)))
+          for pk, ts in first_seen.items()],
+        output_field=DateTimeField(),
+    )
+    updated = Invoice.objects.filter(
+        pk__in=list(first_seen), status=Invoice.STATUS_SENT, viewed_at__isnull=True,
+    ).update(status=Invoice.STATUS_VIEWED, viewed_at=viewed_at, updated_at=timezone.now())
+    cache.delete_many([_view_pending_key(pk) for pk in first_seen])
+    # Status-only change: the cached PDF re-renders on its next download.
+    invalidate_pages(list(first_seen))
+    return updated
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+from clients.models import Client
+from organizations.models import Organization
+from . import portal
+from .models import Invoice, InvoiceLineItem
+from .pdf import PDF_CONTENT_FIELDS
+
+# Sent by Invoice.apply_payments after a bulk balance update (no post_save).
+balances_changed = Signal()
+
+
+class _RenderBatch:
+    """Invoices touched in one transaction, each queued for a render once it commits."""
+
+    def __init__(self):
+        self.pks = set()
+
+    def __call__(self):
+        from .tasks import render_invoice_pdf
+        for pk in self.pks:
+            render_invoice_pdf.delay(pk)
+
+
+def schedule_pdf_render(invoice_pk):
+    """Queue a background PDF re-render once the current transaction commits, once per invoice."""
+    connection = transaction.get_connection()
+    batch = getattr(connection, '_pdf_render_batch', None)
+    # Commit and rollback both drop the pending callbacks; only join a batch still waiting.
+    if batch is not None and any(func is batch for _, func, _ in connection.run_on_commit):
+        batch.pks.add(str(invoice_pk))
+        return
+    batch = connection._pdf_render_batch = _RenderBatch()
+    batch.pks.add(str(invoice_pk))
+    transaction.on_commit(batch, robust=True)
+
+
+def invoice_changed(invoice_pk):
+    """Drop derived copies of an invoice (cached portal page, stored PDF)."""
+    portal.invalidate_page(invoice_pk)
+    schedule_pdf_render(invoice_pk)
+
+
+@receiver(pre_save, sender=Invoice)
+def remember_saved_state(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        return
+    if instance._saved_state is None:
+        # Loaded with some of those columns deferred: read them before they are overwritten.
+        instance._saved_state = Invoice.objects.filter(pk=instance.pk).values(*Invoice.SAVED_STATE_FIELDS).first()
+    # A full save (the edit form) may move the invoice to another client or date.
+    if update_fields is None and instance._saved_state:
+        instance._previous_client_id = instance._saved_state['client_id']
+        instance._previous_issue_date = instance._saved_state['issue_date']
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'pdf_file', 'stripe_payment_intent'}:
+        return
+    portal.invalidate_page(instance.pk)
+    if update_fields is None or PDF_CONTENT_FIELDS & set(update_fields):
+        schedule_pdf_render(instance.pk)
+    before, after = instance.pop_ledger_change()
+    Client.apply_invoice_changes([(before, after)])
+    if before and before[0] != after[0] and instance.amount_paid:
+        # Its payments moved to the other client too.
+        Client.forget_payment_date(before[0])
+        Client.forget_payment_date(after[0])
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, origin=None, **kwargs):
+    portal.invalidate_page(instance.pk)
+    # Deleting the organization takes its clients with it.
+    if isinstance(origin, Organization) or getattr(origin, 'model', None) is Organization:
+        return
+    before, current = instance.pop_ledger_change()
+    Client.apply_invoice_changes([(before or current, None)])
+    if instance.amount_paid:
+        # Its payments went with it, possibly the client's latest.
+        Client.forget_payment_date(instance.client_id)
+
+
+@receiver(post_save, sender=InvoiceLineItem)
+@receiver(post_delete, sender=InvoiceLineItem)
+def line_item_changed(sender, instance, **kwargs):
+    invoice_changed(instance.invoice_id)
+
+
+@receiver(balances_changed)
+def invoice_balances_changed(sender, invoices, **kwargs):
+    # Cached PDFs are keyed on status and amounts, so they re-render on next download.
+    portal.invalidate_pages([invoice.pk for invoice in invoices])
+    Client.apply_invoice_changes(invoice.pop_ledger_change() for invoice in invoices)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=Client)
+def branding_changed(sender, instance, **kwargs):
+    # Org details and client bill-to appear on every portal page of the org.
+    portal.invalidate_organization(getattr(instance, 'organization_id', instance.pk))
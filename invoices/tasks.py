@@ -0,0 +1,123 @@
+import logging
+from celery import shared_task
+from .models import Invoice
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def render_invoice_pdf(invoice_pk):
+    """Re-render the cached PDF for an invoice if its content has changed."""
+    from .pdf import refresh_pdf
+
+    invoice = (
+        Invoice.objects.select_related('client', 'organization')
+        .prefetch_related('line_items')
+        .filter(pk=invoice_pk)
+        .first()
+    )
+    if invoice:
+        refresh_pdf(invoice)
+
+
+@shared_task(bind=True)
+def export_invoice_pdfs(self, organization_pk, user_pk, status='', q=''):
+    """Build a ZIP of invoice PDFs into private storage and notify the requesting user."""
+    import tempfile
+    import uuid
+    from django.core.files import File
+    from django.core.files.storage import default_storage
+    from django.urls import reverse
+    from notifications.models import Notification
+    from .export import export_archive_name, iter_invoice_pdfs, write_zip
+
+    invoices = Invoice.filtered(organization_pk, status, q)
+    total = invoices.count()
+
+    def progress(done):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    token = uuid.uuid4()
+    with tempfile.TemporaryFile() as tmp:
+        write_zip(iter_invoice_pdfs(invoices, progress=progress), tmp)
+        tmp.seek(0)
+        default_storage.save(export_archive_name(organization_pk, token), File(tmp))
+
+    url = reverse('invoices:export_download', args=[token])
+    Notification.objects.create(
+        user_id=user_pk,
+        notification_type=Notification.TYPE_EXPORT,
+        message=f'Your export of {total} invoice PDFs is ready.',
+        link=url,
+    )
+    return {'done': total, 'total': total, 'url': url}
+
+
+@shared_task(ignore_result=True)
+def purge_pdf_exports():
+    """Delete background PDF exports past their retention window."""
+    from .export import purge_expired_exports
+    purge_expired_exports()
+
+
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def send_invoice_emails(self, invoice_pks):
+    """Email a batch of invoices over one connection; failures retry with backoff."""
+    from django.core.mail import get_connection
+    from .emails import UNSENDABLE_STATUSES, dispatch_invoice_emails
+
+    invoices = (
+        Invoice.objects.filter(pk__in=invoice_pks)
+        .exclude(status__in=UNSENDABLE_STATUSES)
+        .select_related('client', 'organization')
+    )
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:  # SMTP connect/auth or API outage: nothing was sent yet
+        logger.exception('Could not open the mail connection for %d invoices', len(invoice_pks))
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries)
+    sent, failed = dispatch_invoice_emails(invoices, connection)
+    if failed:
+        raise self.retry(
+            args=[[str(inv.pk) for inv in failed]],
+            countdown=60 * 2 ** self.request.retries,
+        )
+
+
+@shared_task(ignore_result=True)
+def flush_portal_views():
+    """Persist buffered first views of invoice portal pages."""
+    from .portal import flush_views
+    flush_views()
+
+
+@shared_task(ignore_result=True)
+def mark_overdue_invoices():
+    """Flip past-due outstanding invoices to overdue and notify org owners/admins."""
+    from django.urls import reverse
+    from notifications.models import Notification
+    from organizations.models import OrganizationMembership
+
+    changed = Invoice.mark_overdue()
+    if not changed:
+        return
+    recipients = OrganizationMembership.objects.filter(
+        organization_id__in=changed,
+        role__in=[OrganizationMembership.ROLE_OWNER, OrganizationMembership.ROLE_ADMIN],
+    ).values_list('organization_id', 'user_id')
+    link = reverse('invoices:list') + f'?status={Invoice.STATUS_OVERDUE}'
+    notifications = []
+    for organization_id, user_id in recipients:
+        numbers = changed[organization_id]
+        message = (
+            f'Invoice {numbers[0]} is now overdue.' if len(numbers) == 1
+            else f'{len(numbers)} invoices are now overdue.'
+        )
+        notifications.append(Notification(
+            user_id=user_id,
+            notification_type=Notification.TYPE_OVERDUE,
+            message=message,
+            link=link,
+        ))
+    Notification.objects.bulk_create(notifications, batch_size=500)
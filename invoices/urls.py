@@ -6,6 +6,11 @@ app_name = 'invoices'
 urlpatterns = [
     path('', views.invoice_list, name='list'),
     path('new/', views.invoice_create, name='create'),
+    path('send/', views.invoice_bulk_send, name='bulk_send'),
+    path('export/', views.invoice_export, name='export'),
+    path('export/pdf/', views.invoice_export_pdfs, name='export_pdfs'),
+    path('export/pdf/download/<uuid:token>/', views.invoice_export_download, name='export_download'),
+    path('export/pdf/<str:task_id>/', views.invoice_export_status, name='export_status'),
     path('<uuid:pk>/', views.invoice_detail, name='detail'),
     path('<uuid:pk>/edit/', views.invoice_update, name='update'),
     path('<uuid:pk>/delete/', views.invoice_delete, name='delete'),
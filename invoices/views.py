@@ -1,17 +1,31 @@
-import io
 from datetime import date, timedelta
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, FileResponse
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse, JsonResponse, Http404
+from django.db import transaction
 from django.template.loader import render_to_string
-from django.utils import timezone
-from django.db.models import Q
+from django.utils.cache import get_conditional_response
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 from .models import Invoice, InvoiceLineItem
 from .forms import InvoiceForm, LineItemFormSet
+from .emails import queue_invoice_emails
+from .export import export_archive_name, export_expired, iter_invoice_pdfs, stream_zip, tabular_response
+from . import portal
+from .pagination import keyset_paginate
+from .pdf import pdf_fingerprint, read_or_render_pdf
 from django.conf import settings
 
+INVOICES_PER_PAGE = 50
+EXPORT_COLUMNS = [
+    ('Invoice #', 'invoice_number'), ('Client', 'client__name'), ('Client Email', 'client__email'),
+    ('Status', 'status'), ('Issue Date', 'issue_date'), ('Due Date', 'due_date'),
+    ('Subtotal', 'subtotal'), ('Discount', 'discount_amount'), ('Tax', 'tax_amount'),
+    ('Total', 'total'), ('Paid', 'amount_paid'), ('Sent', 'sent_at'), ('Created', 'created_at'),
+]
+
 
 def get_org(request):
     m = request.user.memberships.select_related('organization').first()
@@ -21,15 +35,12 @@ def get_org(request):
 @login_required
 def invoice_list(request):
     org = get_org(request)
-    qs = Invoice.objects.filter(organization=org).select_related('client')
     status_filter = request.GET.get('status', '')
     q = request.GET.get('q', '')
-    if status_filter:
-        qs = qs.filter(status=status_filter)
-    if q:
-        qs = qs.filter(Q(invoice_number__icontains=q) | Q(client__name__icontains=q))
+    qs = Invoice.filtered(org, status_filter, q)
+    page = keyset_paginate(qs, request, ordering=['-created_at', '-id'], per_page=INVOICES_PER_PAGE)
     return render(request, 'invoices/list.html', {
-        'invoices': qs, 'status_filter': status_filter, 'q': q,
+        'invoices': page, 'page': page, 'status_filter': status_filter, 'q': q,
         'statuses': Invoice.STATUS_CHOICES,
     })
 
@@ -41,16 +52,17 @@ def invoice_create(request):
         form = InvoiceForm(org, request.POST)
         formset = LineItemFormSet(request.POST)
         if form.is_valid() and formset.is_valid():
-            invoice = form.save(commit=False)
-            invoice.organization = org
-            invoice.invoice_number = Invoice.generate_invoice_number(org)
-            invoice.issue_date = invoice.issue_date or date.today()
-            if not invoice.due_date:
-                invoice.due_date = date.today() + timedelta(days=org.payment_terms)
-            invoice.save()
-            formset.instance = invoice
-            formset.save()
-            invoice.recalculate_totals()
+            # The sequence row stays locked until the invoice is committed, so a
+            # failed insert rolls the number back instead of leaving a gap.
+            with transaction.atomic():
+                invoice = form.save(commit=False)
+                invoice.organization = org
+                invoice.invoice_number = Invoice.generate_invoice_number(org)
+                invoice.issue_date = invoice.issue_date or date.today()
+                if not invoice.due_date:
+                    invoice.due_date = date.today() + timedelta(days=org.payment_terms)
+                formset.instance = invoice
+                formset.save_bulk()  # Inserts the invoice, then its line items in bulk
             messages.success(request, f'Invoice {invoice.invoice_number} created.')
             return redirect('invoices:detail', pk=invoice.pk)
     else:
@@ -81,9 +93,9 @@ def invoice_update(request, pk):
         form = InvoiceForm(org, request.POST, instance=invoice)
         formset = LineItemFormSet(request.POST, instance=invoice)
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
-            invoice.recalculate_totals()
+            with transaction.atomic():
+                form.save()
+                formset.save_bulk()
             messages.success(request, 'Invoice updated.')
             return redirect('invoices:detail', pk=pk)
     else:
@@ -119,201 +131,155 @@ def invoice_send(request, pk):
         messages.error(request, 'Cannot send a cancelled or paid invoice.')
         return redirect('invoices:detail', pk=pk)
 
-    # Always use the production URL for portal links (localhost triggers spam)
-    base_url = getattr(settings, 'SITE_URL', '').rstrip('/')
-    portal_url = f'{base_url}/invoices/portal/{invoice.pk}/'
+    # Rendering and delivery happen in a Celery worker; status/sent_at are
+    # only updated there once the provider has accepted the message.
+    from .tasks import send_invoice_emails
+    send_invoice_emails.delay([str(invoice.pk)])
+    messages.success(request, f'Invoice queued for delivery to {invoice.client.email}')
+    return redirect('invoices:detail', pk=pk)
+
 
-    subject = f'Invoice {invoice.invoice_number} from {org.name}'
-    ctx = {'invoice': invoice, 'org': org, 'portal_url': portal_url}
+@login_required
+@require_POST
+def invoice_bulk_send(request):
+    """Queue emails for every invoice ticked on the list page."""
+    org = get_org(request)
+    outcomes = queue_invoice_emails(org, request.POST.getlist('invoice_ids'))
+    queued = sum(1 for outcome in outcomes.values() if outcome == 'queued')
+    skipped = len(outcomes) - queued
+    if queued:
+        messages.success(request, f'Queued {queued} invoice{"s" if queued != 1 else ""} for delivery.')
+    if skipped:
+        messages.warning(request, f'Skipped {skipped} paid, cancelled or unknown invoice{"s" if skipped != 1 else ""}.')
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('invoices:list')
 
-    # Plain-text fallback
-    text_body = render_to_string('invoices/email_body.txt', ctx)
-    # Rich HTML invoice
-    html_body = render_to_string('invoices/email_invoice.html', ctx)
 
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=text_body,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[invoice.client.email],
-        reply_to=[settings.DEFAULT_FROM_EMAIL],
+@login_required
+def invoice_pdf(request, pk):
+    org = get_org(request)
+    invoice = get_object_or_404(
+        Invoice.objects.select_related('client').prefetch_related('line_items'),
+        pk=pk, organization=org,
     )
-    email.attach_alternative(html_body, 'text/html')
+    fingerprint = pdf_fingerprint(invoice, org)
+    etag = f'"{fingerprint}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
 
-    # Anti-spam headers
-    email.extra_headers['X-Mailer'] = 'InvoiceFlow'
-    email.extra_headers['X-Entity-Ref-ID'] = str(invoice.pk)
+    response = HttpResponse(read_or_render_pdf(invoice, fingerprint), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{invoice.invoice_number}.pdf"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-    email.send(fail_silently=False)
 
-    invoice.status = Invoice.STATUS_SENT
-    invoice.sent_at = timezone.now()
-    invoice.save(update_fields=['status', 'sent_at'])
-    messages.success(request, f'Invoice sent to {invoice.client.email}')
-    return redirect('invoices:detail', pk=pk)
+@login_required
+def invoice_export_pdfs(request):
+    """Download every invoice matching the list filters as one ZIP of PDFs."""
+    org = get_org(request)
+    status_filter = request.GET.get('status', '')
+    q = request.GET.get('q', '')
+    invoices = Invoice.filtered(org, status_filter, q)
+    if invoices.count() > settings.PDF_EXPORT_INLINE_LIMIT:
+        from .tasks import export_invoice_pdfs
+        result = export_invoice_pdfs.delay(str(org.pk), str(request.user.pk), status_filter, q)
+        request.session['pdf_exports'] = request.session.get('pdf_exports', [])[-9:] + [result.id]
+        messages.info(request, 'Large export started — you will get a notification when the ZIP is ready.')
+        query = request.GET.urlencode()
+        return redirect(f"{reverse('invoices:list')}?{query}" if query else 'invoices:list')
+    response = StreamingHttpResponse(stream_zip(iter_invoice_pdfs(invoices)), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="invoices-{date.today()}.zip"'
+    return response
 
 
 @login_required
-def invoice_pdf(request, pk):
+def invoice_export(request):
+    """Stream every invoice matching the list filters as CSV or XLSX (?export=xlsx)."""
     org = get_org(request)
-    invoice = get_object_or_404(Invoice, pk=pk, organization=org)
-    pdf_bytes = _generate_pdf(invoice, org)
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{invoice.invoice_number}.pdf"'
-    return response
+    invoices = Invoice.filtered(org, request.GET.get('status', ''), request.GET.get('q', ''))
+    invoices = invoices.order_by('-created_at', '-id')
+    return tabular_response(invoices, EXPORT_COLUMNS, 'invoices', request.GET.get('export', 'csv'))
+
+
+@login_required
+def invoice_export_status(request, task_id):
+    """Progress of a background PDF export started by this session."""
+    if task_id not in request.session.get('pdf_exports', []):
+        raise Http404
+    from celery.result import AsyncResult
+    result = AsyncResult(task_id)
+    info = result.info if isinstance(result.info, dict) else {}
+    return JsonResponse({'state': result.state, **info})
+
+
+@login_required
+def invoice_export_download(request, token):
+    """Serve a finished background PDF export to members of the organization that ran it."""
+    from django.core.files.storage import default_storage
+    org = get_org(request)
+    if org is None:
+        raise Http404
+    name = export_archive_name(org.pk, token)
+    if not default_storage.exists(name) or export_expired(name):
+        raise Http404
+    return FileResponse(default_storage.open(name, 'rb'), as_attachment=True,
+                        filename=f'invoices-{date.today()}.zip', content_type='application/zip')
 
 
 @login_required
 def invoice_duplicate(request, pk):
     org = get_org(request)
     original = get_object_or_404(Invoice, pk=pk, organization=org)
-    new_invoice = Invoice.objects.create(
-        organization=org,
-        client=original.client,
-        invoice_number=Invoice.generate_invoice_number(org),
-        status=Invoice.STATUS_DRAFT,
-        issue_date=date.today(),
-        due_date=date.today() + timedelta(days=org.payment_terms),
-        notes=original.notes,
-        terms=original.terms,
-        discount_amount=original.discount_amount,
-    )
-    for item in original.line_items.all():
-        InvoiceLineItem.objects.create(
-            invoice=new_invoice,
-            description=item.description,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            tax_rate=item.tax_rate,
-            discount=item.discount,
+    with transaction.atomic():
+        new_invoice = Invoice(
+            organization=org,
+            client=original.client,
+            invoice_number=Invoice.generate_invoice_number(org),
+            status=Invoice.STATUS_DRAFT,
+            issue_date=date.today(),
+            due_date=date.today() + timedelta(days=org.payment_terms),
+            notes=original.notes,
+            terms=original.terms,
+            discount_amount=original.discount_amount,
         )
-    new_invoice.recalculate_totals()
+        new_invoice.save_line_items([
+            InvoiceLineItem(
+                description=item.description,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                tax_rate=item.tax_rate,
+                discount=item.discount,
+            )
+            for item in original.line_items.all()
+        ])
     messages.success(request, f'Duplicated as {new_invoice.invoice_number}')
     return redirect('invoices:detail', pk=new_invoice.pk)
 
 
 def invoice_portal(request, pk):
     """Public client-facing portal — no login required."""
-    invoice = get_object_or_404(Invoice, pk=pk)
-    if invoice.status == Invoice.STATUS_SENT and not invoice.viewed_at:
-        invoice.viewed_at = timezone.now()
-        invoice.status = Invoice.STATUS_VIEWED
-        invoice.save(update_fields=['viewed_at', 'status'])
-    stripe_public_key = settings.STRIPE_PUBLIC_KEY
-    return render(request, 'invoices/portal.html', {
-        'invoice': invoice,
-        'org': invoice.organization,
-        'stripe_public_key': stripe_public_key,
-    })
-
-
-def _generate_pdf(invoice, org):
-    """Generate a PDF invoice using ReportLab."""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import mm
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm,
-                            topMargin=20*mm, bottomMargin=20*mm)
-    styles = getSampleStyleSheet()
-    primary = colors.HexColor('#4f46e5')
-    story = []
-
-    # Header
-    header_data = [
-        [Paragraph(f'<font size="22" color="#4f46e5"><b>InvoiceFlow</b></font>', styles['Normal']),
-         Paragraph(f'<font size="18"><b>INVOICE</b></font><br/>'
-                   f'<font size="10" color="grey">{invoice.invoice_number}</font>', styles['Normal'])]
-    ]
-    header_table = Table(header_data, colWidths=[100*mm, 70*mm])
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-    ]))
-    story.append(header_table)
-    story.append(Spacer(1, 10*mm))
-
-    # Org / Client info
-    info_data = [
-        [Paragraph(f'<b>{org.name}</b><br/>{org.address or ""}<br/>{org.phone or ""}', styles['Normal']),
-         Paragraph(f'<b>Bill To:</b><br/>{invoice.client.name}<br/>{invoice.client.email}<br/>'
-                   f'{invoice.client.billing_address or ""}', styles['Normal'])]
-    ]
-    info_table = Table(info_data, colWidths=[90*mm, 80*mm])
-    story.append(info_table)
-    story.append(Spacer(1, 8*mm))
-
-    # Dates
-    dates_data = [
-        ['Issue Date', str(invoice.issue_date)],
-        ['Due Date', str(invoice.due_date)],
-        ['Status', invoice.get_status_display()],
-    ]
-    dates_table = Table(dates_data, colWidths=[50*mm, 50*mm])
-    dates_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(dates_table)
-    story.append(Spacer(1, 10*mm))
-
-    # Line items
-    item_data = [['Description', 'Qty', 'Unit Price', 'Tax %', 'Discount %', 'Amount']]
-    for item in invoice.line_items.all():
-        item_data.append([
-            item.description,
-            str(item.quantity),
-            f'${item.unit_price:.2f}',
-            f'{item.tax_rate}%',
-            f'{item.discount}%',
-            f'${item.amount:.2f}',
-        ])
-    items_table = Table(item_data, colWidths=[80*mm, 18*mm, 26*mm, 18*mm, 22*mm, 22*mm])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), primary),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(items_table)
-    story.append(Spacer(1, 8*mm))
-
-    # Totals
-    totals_data = [
-        ['Subtotal', f'${invoice.subtotal:.2f}'],
-        ['Discount', f'-${invoice.discount_amount:.2f}'],
-        ['Tax', f'${invoice.tax_amount:.2f}'],
-        ['TOTAL DUE', f'${invoice.total:.2f}'],
-    ]
-    totals_table = Table(totals_data, colWidths=[120*mm, 30*mm])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 13),
-        ('BACKGROUND', (0, -1), (-1, -1), primary),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
-        ('LINEABOVE', (0, -1), (-1, -1), 1, primary),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(totals_table)
-
-    if invoice.notes:
-        story.append(Spacer(1, 10*mm))
-        story.append(Paragraph(f'<b>Notes:</b> {invoice.notes}', styles['Normal']))
-    if invoice.terms:
-        story.append(Spacer(1, 4*mm))
-        story.append(Paragraph(f'<b>Terms:</b> {invoice.terms}', styles['Normal']))
-
-    doc.build(story)
-    return buffer.getvalue()
+    page = portal.get_cached_page(pk)
+    if page is None:
+        invoice = get_object_or_404(
+            Invoice.objects.select_related('organization', 'client').prefetch_related('line_items'),
+            pk=pk,
+        )
+        html = render_to_string('invoices/portal.html', {
+            'invoice': invoice,
+            'org': invoice.organization,
+            'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
+        }, request=request)
+        page = portal.cache_page(invoice, html)
+    if page['track_view']:
+        portal.record_view(pk)  # Written by the flush_portal_views task, not here
+    not_modified = get_conditional_response(request, etag=page['etag'])
+    if not_modified is not None:
+        return not_modified
+    response = HttpResponse(page['html'])
+    response['ETag'] = page['etag']
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('payment_received', 'Payment Received'), ('invoice_viewed', 'Invoice Viewed'), ('reminder_sent', 'Reminder Sent'), ('invitation', 'Invitation'), ('export_ready', 'Export Ready')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_export_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('payment_received', 'Payment Received'), ('invoice_viewed', 'Invoice Viewed'), ('reminder_sent', 'Reminder Sent'), ('invitation', 'Invitation'), ('export_ready', 'Export Ready'), ('invoice_overdue', 'Invoice Overdue')], max_length=30),
+        ),
+    ]
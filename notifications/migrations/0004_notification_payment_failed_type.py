@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_overdue_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('payment_received', 'Payment Received'), ('payment_failed', 'Payment Failed'), ('invoice_viewed', 'Invoice Viewed'), ('reminder_sent', 'Reminder Sent'), ('invitation', 'Invitation'), ('export_ready', 'Export Ready'), ('invoice_overdue', 'Invoice Overdue')], max_length=30),
+        ),
+    ]
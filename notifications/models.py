@@ -8,14 +8,20 @@ class Notification(models.Model):
     In-app notification for users (payment received, invoice viewed, etc).
     """
     TYPE_PAYMENT = 'payment_received'
+    TYPE_PAYMENT_FAILED = 'payment_failed'
     TYPE_VIEWED = 'invoice_viewed'
     TYPE_REMINDER = 'reminder_sent'
     TYPE_INVITE = 'invitation'
+    TYPE_EXPORT = 'export_ready'
+    TYPE_OVERDUE = 'invoice_overdue'
     TYPE_CHOICES = [
         (TYPE_PAYMENT, 'Payment Received'),
+        (TYPE_PAYMENT_FAILED, 'Payment Failed'),
         (TYPE_VIEWED, 'Invoice Viewed'),
         (TYPE_REMINDER, 'Reminder Sent'),
         (TYPE_INVITE, 'Invitation'),
+        (TYPE_EXPORT, 'Export Ready'),
+        (TYPE_OVERDUE, 'Invoice Overdue'),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import BankStatement, BankStatementLine, CheckoutSession, Payment, Receipt, StripeEvent
 
 
 @admin.register(Payment)
@@ -8,3 +8,55 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['method', 'payment_date']
     search_fields = ['invoice__invoice_number', 'stripe_charge_id']
     date_hierarchy = 'payment_date'
+
+
+class AllocationInline(admin.TabularInline):
+    model = Payment
+    fields = ['invoice', 'amount', 'payment_date']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Receipt)
+class ReceiptAdmin(admin.ModelAdmin):
+    list_display = ['client', 'amount', 'unallocated_amount', 'method', 'payment_date']
+    list_filter = ['method', 'payment_date']
+    search_fields = ['client__name', 'reference']
+    inlines = [AllocationInline]
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event_type', 'invoice', 'status', 'attempts', 'stripe_created']
+    list_filter = ['status', 'event_type']
+    search_fields = ['event_id', 'invoice__invoice_number']
+    readonly_fields = ['event_id', 'event_type', 'invoice', 'payload', 'attempts', 'error',
+                       'stripe_created', 'received_at', 'processed_at']
+    actions = ['replay_events']
+
+    @admin.action(description='Replay selected events')
+    def replay_events(self, request, queryset):
+        for event in queryset:
+            event.replay()
+        self.message_user(request, f'{queryset.count()} events queued for replay.')
+
+
+@admin.register(CheckoutSession)
+class CheckoutSessionAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'invoice', 'amount', 'currency', 'expires_at']
+    search_fields = ['session_id', 'invoice__invoice_number']
+
+
+@admin.register(BankStatement)
+class BankStatementAdmin(admin.ModelAdmin):
+    list_display = ['file', 'organization', 'status', 'line_count', 'matched_count', 'review_count', 'created_at']
+    list_filter = ['status']
+
+
+@admin.register(BankStatementLine)
+class BankStatementLineAdmin(admin.ModelAdmin):
+    list_display = ['statement', 'line_number', 'date', 'amount', 'counterparty', 'status', 'invoice']
+    list_filter = ['status']
+    search_fields = ['reference', 'counterparty']
+    raw_id_fields = ['statement', 'invoice', 'payment']
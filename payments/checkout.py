@@ -0,0 +1,141 @@
+"""
+Stripe Checkout sessions for the public invoice portal.
+
+A session is created once per invoice and balance and reused on later
+visits, so repeat clicks cost no Stripe round trip. The Stripe call is made
+outside the invoice's row lock; the result is only stored if the balance
+is unchanged and no concurrent request stored a session first. Set STRIPE_API_BASE to
+point the client at a local stand-in such as stripe-mock.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from invoices.models import Invoice
+from .models import CheckoutSession
+
+# Don't hand out a session the client could not finish before it expires.
+REUSE_MARGIN = timedelta(minutes=5)
+
+
+def stripe_api():
+    """The stripe module configured with this site's key (and API base, if set)."""
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+    return stripe
+
+
+def checkout_currency(invoice):
+    return (invoice.client.currency or invoice.organization.currency or 'usd').lower()
+
+
+def _locked_balance(invoice_pk):
+    """The invoice's balance read under a row lock (None once it can't be paid). Call inside a transaction."""
+    row = (
+        Invoice.objects.select_for_update().filter(pk=invoice_pk)
+        .values_list('total', 'amount_paid', 'status').first()
+    )
+    if row is None or row[2] in (Invoice.STATUS_PAID, Invoice.STATUS_CANCELLED) or row[0] <= row[1]:
+        return None
+    return row[0] - row[1]
+
+
+def _reusable_session(invoice_pk, amount, currency):
+    return CheckoutSession.objects.filter(
+        invoice_id=invoice_pk, amount=amount, currency=currency,
+        expires_at__gt=timezone.now() + REUSE_MARGIN,
+    ).order_by('-expires_at').first()
+
+
+def open_checkout_session(invoice, success_url, cancel_url):
+    """
+    Return a CheckoutSession for the invoice's current balance, creating it if
+    needed, or None when there is nothing left to pay. The balance and reuse
+    check are read under the invoice lock, but the Stripe call is made
+    outside it so a slow response never holds up payments on the invoice.
+    """
+    currency = checkout_currency(invoice)
+    while True:
+        with transaction.atomic():
+            amount = _locked_balance(invoice.pk)
+            if amount is None:
+                return None
+            session = _reusable_session(invoice.pk, amount, currency)
+            if session:
+                return session
+
+        expires_at = timezone.now() + timedelta(seconds=settings.STRIPE_CHECKOUT_SESSION_TTL)
+        stripe_session = stripe_api().checkout.Session.create(
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': currency,
+                    'product_data': {'name': f'Invoice {invoice.invoice_number} — {invoice.organization.name}'},
+                    'unit_amount': int(amount * 100),
+                },
+                'quantity': 1,
+            }],
+            mode='payment',
+            success_url=success_url,
+            cancel_url=cancel_url,
+            expires_at=int(expires_at.timestamp()),
+            metadata={'invoice_pk': str(invoice.pk)},
+            payment_intent_data={'metadata': {'invoice_pk': str(invoice.pk)}},
+        )
+
+        with transaction.atomic():
+            # While we waited on Stripe a payment may have moved the balance,
+            # or a concurrent click may have stored a session for it first.
+            balance = _locked_balance(invoice.pk)
+            if balance == amount:
+                session = _reusable_session(invoice.pk, amount, currency)
+                if session is None:
+                    session = CheckoutSession.objects.create(
+                        invoice=invoice,
+                        session_id=stripe_session.id,
+                        url=stripe_session.url,
+                        amount=amount,
+                        currency=currency,
+                        expires_at=expires_at,
+                    )
+                    invoice.stripe_payment_intent = stripe_session.payment_intent or stripe_session.id
+                    invoice.save(update_fields=['stripe_payment_intent'])
+                    return session
+            from .tasks import expire_checkout_sessions
+            transaction.on_commit(lambda: expire_checkout_sessions.delay([stripe_session.id]), robust=True)
+        if session or balance is None:
+            return session
+        # The balance changed: go round again for the new amount.
+
+
+def discard_stale_sessions(*invoices):
+    """Drop sessions that no longer match their invoice's balance and expire them at Stripe."""
+    balances = {
+        invoice.pk: None if invoice.status in (Invoice.STATUS_PAID, Invoice.STATUS_CANCELLED)
+        else invoice.balance_due
+        for invoice in invoices
+    }
+    sessions = CheckoutSession.objects.filter(invoice__in=list(balances)).values_list(
+        'session_id', 'invoice_id', 'amount',
+    )
+    session_ids = [
+        session_id for session_id, invoice_pk, amount in sessions
+        if amount != balances[invoice_pk]
+    ]
+    if not session_ids:
+        return
+    CheckoutSession.objects.filter(session_id__in=session_ids).delete()
+    if settings.STRIPE_SECRET_KEY:
+        from .tasks import expire_checkout_sessions
+        transaction.on_commit(lambda: expire_checkout_sessions.delay(session_ids), robust=True)
+
+
+def expire_sessions(session_ids):
+    stripe = stripe_api()
+    for session_id in session_ids:
+        try:
+            stripe.checkout.Session.expire(session_id)
+        except stripe.error.InvalidRequestError:
+            pass  # Already completed or expired.
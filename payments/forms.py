@@ -1,5 +1,5 @@
 from django import forms
-from .models import Payment
+from .models import BankStatement, Payment, Receipt
 from django.utils import timezone
 
 
@@ -19,3 +19,41 @@ class PaymentForm(forms.ModelForm):
         if invoice:
             self.fields['amount'].initial = invoice.balance_due
         self.fields['payment_date'].initial = timezone.now().date()
+
+
+class BankStatementForm(forms.ModelForm):
+    class Meta:
+        model = BankStatement
+        fields = ['file']
+        widgets = {
+            'file': forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'}),
+        }
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.ofx', '.qfx')):
+            raise forms.ValidationError('Upload a CSV or OFX bank statement.')
+        return upload
+
+
+class ReceiptForm(forms.ModelForm):
+    class Meta:
+        model = Receipt
+        fields = ['amount', 'payment_date', 'method', 'reference']
+        widgets = {
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
+            'payment_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'method': forms.Select(attrs={'class': 'form-select'}),
+            'reference': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Bank reference…'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['payment_date'].initial = timezone.now().date()
+        self.fields['method'].initial = Payment.METHOD_BANK_TRANSFER
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount <= 0:
+            raise forms.ValidationError('Amount must be positive.')
+        return amount
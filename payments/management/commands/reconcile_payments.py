@@ -0,0 +1,48 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from invoices.models import Invoice
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = "Compare each invoice's amount_paid with the sum of its payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite mismatched amount_paid and status.')
+
+    def handle(self, *args, **options):
+        ledger = (
+            Payment.objects.filter(invoice=OuterRef('pk'))
+            .order_by()
+            .values('invoice')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        mismatched = (
+            Invoice.objects.annotate(
+                ledger_total=Coalesce(
+                    Subquery(ledger), Value(Decimal('0')),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+            .exclude(amount_paid=F('ledger_total'))
+            .values_list('pk', 'invoice_number', 'amount_paid', 'ledger_total')
+        )
+        count = 0
+        for pk, number, amount_paid, ledger_total in list(mismatched):
+            count += 1
+            self.stdout.write(f'{number} ({pk}): amount_paid {amount_paid}, payments {ledger_total}')
+            if options['fix']:
+                with transaction.atomic():
+                    invoice = Invoice.objects.select_for_update().get(pk=pk)
+                    actual = invoice.payments.aggregate(total=Sum('amount'))['total'] or 0
+                    Invoice.apply_payment(pk, actual - invoice.amount_paid)
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All invoice balances match their payments.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {count} invoices.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{count} invoices out of balance; re-run with --fix to correct.'))
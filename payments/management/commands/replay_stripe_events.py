@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from payments.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = 'Re-queue stored Stripe webhook events for processing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Stripe event ids (evt_...) to replay.')
+        parser.add_argument('--failed', action='store_true', help='Replay every failed event.')
+        parser.add_argument('--pending', action='store_true', help='Re-queue events still pending.')
+
+    def handle(self, *args, **options):
+        statuses = [
+            status for status, flag in [
+                (StripeEvent.STATUS_FAILED, options['failed']),
+                (StripeEvent.STATUS_PENDING, options['pending']),
+            ] if flag
+        ]
+        if not options['event_ids'] and not statuses:
+            raise CommandError('Give event ids, --failed or --pending.')
+        events = StripeEvent.objects.filter(event_id__in=options['event_ids'])
+        if statuses:
+            events |= StripeEvent.objects.filter(status__in=statuses)
+        count = 0
+        for event in events.order_by('stripe_created').iterator():
+            event.replay()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued {count} events for replay.'))
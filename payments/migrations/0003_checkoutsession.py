@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:27
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0004_invoice_status_due_idx'),
+        ('payments', '0002_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('session_id', models.CharField(max_length=255, unique=True)),
+                ('url', models.TextField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(max_length=3)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_sessions', to='invoices.invoice')),
+            ],
+            options={
+                'verbose_name': 'Checkout Session',
+                'indexes': [models.Index(fields=['invoice', 'amount', 'expires_at'], name='checkout_invoice_amount_idx')],
+            },
+        ),
+    ]
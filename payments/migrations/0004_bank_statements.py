@@ -0,0 +1,64 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0004_invoice_status_due_idx'),
+        ('organizations', '0001_initial'),
+        ('payments', '0003_checkoutsession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='statements/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('complete', 'Complete'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('matched_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bank_statements', to='organizations.organization')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Bank Statement',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BankStatementLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('line_number', models.PositiveIntegerField()),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference', models.CharField(blank=True, max_length=500)),
+                ('counterparty', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('matched', 'Matched'), ('review', 'Needs Review'), ('unmatched', 'Unmatched'), ('ignored', 'Ignored')], max_length=20)),
+                ('candidates', models.JSONField(blank=True, default=list)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_statement_lines', to='invoices.invoice')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bank_statement_lines', to='organizations.organization')),
+                ('payment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_statement_line', to='payments.payment')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payments.bankstatement')),
+            ],
+            options={
+                'verbose_name': 'Bank Statement Line',
+                'ordering': ['statement', 'line_number'],
+                'indexes': [models.Index(fields=['statement', 'status', 'line_number'], name='bank_line_review_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'fingerprint'), name='bank_line_fingerprint_uniq')],
+            },
+        ),
+    ]
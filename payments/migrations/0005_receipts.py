@@ -0,0 +1,40 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+        ('organizations', '0001_initial'),
+        ('payments', '0004_bank_statements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment_date', models.DateField()),
+                ('method', models.CharField(choices=[('stripe', 'Stripe (Online)'), ('bank_transfer', 'Bank Transfer'), ('cash', 'Cash'), ('cheque', 'Cheque')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=200)),
+                ('unallocated_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='receipts', to='clients.client')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Receipt',
+                'ordering': ['-payment_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='receipt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='payments.receipt'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Payment = apps.get_model('payments', 'Payment')
+    Invoice = apps.get_model('invoices', 'Invoice')
+    organizations = Invoice.objects.filter(pk=models.OuterRef('invoice_id')).values('organization_id')[:1]
+    Payment.objects.update(organization_id=models.Subquery(organizations), updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0005_invoice_client_created_idx'),
+        ('organizations', '0001_initial'),
+        ('payments', '0005_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='organization',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='organizations.organization'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='organization',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='organizations.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='payment_org_updated_idx'),
+        ),
+    ]
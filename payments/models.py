@@ -1,11 +1,14 @@
 import uuid
-from django.db import models
+from datetime import date
+from django.conf import settings
+from django.db import models, transaction
 from invoices.models import Invoice
 
 
 class Payment(models.Model):
     """
-    Records a payment (full or partial) against an invoice.
+    Records a payment (full or partial) against an invoice. Refunds are
+    recorded as payments with a negative amount.
     """
     METHOD_STRIPE = 'stripe'
     METHOD_BANK_TRANSFER = 'bank_transfer'
@@ -20,6 +23,10 @@ class Payment(models.Model):
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Copied from the invoice on save, so org-wide queries need no join.
+    organization = models.ForeignKey(
+        'organizations.Organization', on_delete=models.CASCADE, related_name='payments', editable=False,
+    )
     invoice = models.ForeignKey(
         Invoice, on_delete=models.CASCADE, related_name='payments',
     )
@@ -27,26 +34,410 @@ class Payment(models.Model):
     payment_date = models.DateField()
     method = models.CharField(max_length=20, choices=METHOD_CHOICES)
     stripe_charge_id = models.CharField(max_length=200, blank=True)
+    receipt = models.ForeignKey(
+        'Receipt', on_delete=models.CASCADE, null=True, blank=True, related_name='allocations',
+    )
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Payment'
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['organization', 'updated_at', 'id'], name='payment_org_updated_idx'),
+        ]
 
     def __str__(self):
         return f'Payment {self.amount} for {self.invoice.invoice_number}'
 
+    @classmethod
+    def filtered(cls, organization, client='', method='', date_from=None, date_to=None):
+        """Org payments narrowed by client, method and an inclusive payment date range."""
+        qs = cls.objects.filter(organization=organization)
+        if client:
+            qs = qs.filter(invoice__client_id=client)
+        if method:
+            qs = qs.filter(method=method)
+        if date_from:
+            qs = qs.filter(payment_date__gte=date_from)
+        if date_to:
+            qs = qs.filter(payment_date__lte=date_to)
+        return qs
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update invoice amount_paid and status
-        invoice = self.invoice
-        total_paid = invoice.payments.aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        invoice.amount_paid = total_paid
-        if total_paid >= invoice.total:
-            invoice.status = Invoice.STATUS_PAID
-        elif total_paid > 0:
-            invoice.status = Invoice.STATUS_PARTIALLY_PAID
-        invoice.save(update_fields=['amount_paid', 'status'])
+        """Save and apply the change in amount to the invoice's balance and status."""
+        self.organization_id = self.invoice.organization_id
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = (
+                    Payment.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values('invoice_id', 'invoice__client_id', 'amount', 'payment_date')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            deltas = {self.invoice_id: self.amount}
+            if previous:
+                deltas[previous['invoice_id']] = deltas.get(previous['invoice_id'], 0) - previous['amount']
+            # Lock invoices in a fixed order so concurrent moves cannot deadlock.
+            for invoice_pk in sorted(deltas, key=str):
+                Invoice.apply_payment(invoice_pk, deltas[invoice_pk])
+            from clients.models import Client
+            if previous and previous['amount'] > 0:
+                Client.forget_payment_date(previous['invoice__client_id'], previous['payment_date'])
+            if self.amount > 0:
+                Client.record_payment_dates([(self.invoice.client_id, self.payment_date)])
+
+
+class Receipt(models.Model):
+    """
+    One incoming payment from a client (e.g. a single bank transfer) split
+    across several invoices. Each invoice's share is a Payment linked back
+    here, so balances and reports keep reading the per-invoice Payment ledger.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(
+        'organizations.Organization', on_delete=models.CASCADE, related_name='receipts',
+    )
+    client = models.ForeignKey('clients.Client', on_delete=models.PROTECT, related_name='receipts')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_date = models.DateField()
+    method = models.CharField(max_length=20, choices=Payment.METHOD_CHOICES)
+    reference = models.CharField(max_length=200, blank=True)
+    # Part of the receipt not applied to any invoice (credit on account).
+    unallocated_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Receipt'
+        ordering = ['-payment_date']
+
+    def __str__(self):
+        return f'Receipt {self.amount} from {self.client}'
+
+    @classmethod
+    def record(cls, organization, client, amount, payment_date, method, reference='', allocations=None):
+        """
+        Record a receipt and split it across the client's invoices in one
+        locked batch. `allocations` maps invoice pk to amount; without it open
+        invoices are paid oldest due date first. Raises ValidationError if an
+        explicit allocation is invalid.
+        """
+        from django.core.exceptions import ValidationError
+
+        with transaction.atomic():
+            invoices = Invoice.objects.select_for_update().filter(organization=organization, client=client)
+            if allocations:
+                allocations = {uuid.UUID(str(pk)): share for pk, share in allocations.items()}
+                locked = {
+                    invoice.pk: invoice
+                    for invoice in invoices.filter(pk__in=list(allocations), status__in=Invoice.OPEN_STATUSES)
+                    .order_by('pk')
+                }
+                # Drafts, paid and cancelled invoices take no payments; name them in the error.
+                closed = {}
+                missing = [pk for pk in allocations if pk not in locked]
+                if missing:
+                    rows = Invoice.objects.filter(organization=organization, client=client, pk__in=missing)
+                    closed = {pk: (number, status) for pk, number, status in
+                              rows.values_list('pk', 'invoice_number', 'status')}
+                labels = dict(Invoice.STATUS_CHOICES)
+                errors = []
+                for pk, share in allocations.items():
+                    invoice = locked.get(pk)
+                    if pk in closed:
+                        number, status = closed[pk]
+                        errors.append(f'{number}: {labels[status].lower()} invoices cannot take payments.')
+                    elif invoice is None:
+                        errors.append(f'Invoice {pk} does not belong to this client.')
+                    elif share <= 0:
+                        errors.append(f'{invoice.invoice_number}: amount must be positive.')
+                    elif share > invoice.balance_due:
+                        errors.append(f'{invoice.invoice_number}: {share} exceeds the balance of {invoice.balance_due}.')
+                if sum(allocations.values()) > amount:
+                    errors.append(f'Allocations total more than the receipt amount of {amount}.')
+                if errors:
+                    raise ValidationError(errors)
+                shares = allocations
+            else:
+                open_invoices = sorted(
+                    invoices.filter(status__in=Invoice.OPEN_STATUSES).order_by('pk'),
+                    key=lambda invoice: (invoice.due_date, invoice.issue_date, invoice.created_at),
+                )
+                shares = {}
+                remaining = amount
+                for invoice in open_invoices:
+                    if remaining <= 0:
+                        break
+                    share = min(invoice.balance_due, remaining)
+                    if share > 0:
+                        shares[invoice.pk] = share
+                        remaining -= share
+
+            receipt = cls.objects.create(
+                organization=organization,
+                client=client,
+                amount=amount,
+                payment_date=payment_date,
+                method=method,
+                reference=reference,
+                unallocated_amount=amount - sum(shares.values()),
+            )
+            Payment.objects.bulk_create([
+                Payment(
+                    organization=organization,
+                    invoice_id=pk,
+                    receipt=receipt,
+                    amount=share,
+                    payment_date=payment_date,
+                    method=method,
+                    notes=reference,
+                )
+                for pk, share in shares.items()
+            ])
+            Invoice.apply_payments(shares)
+            from clients.models import Client
+            from dashboard.models import DailyRevenue
+            if shares:
+                Client.record_payment_dates([(client.pk, payment_date)])
+            DailyRevenue.refresh([(client.pk, payment_date)])
+        return receipt
+
+
+class StripeEvent(models.Model):
+    """
+    Ledger of received Stripe webhook events, keyed by Stripe's event id.
+    Events are stored on receipt and applied later by a Celery worker, so
+    Stripe retries are acknowledged without being processed twice.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_IGNORED = 'ignored'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_IGNORED, 'Ignored'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='stripe_events',
+    )
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    stripe_created = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Stripe Event'
+        ordering = ['-stripe_created']
+        indexes = [
+            models.Index(fields=['invoice', 'status', 'stripe_created'], name='stripe_event_invoice_idx'),
+            models.Index(fields=['status', 'received_at'], name='stripe_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_type} {self.event_id}'
+
+    @classmethod
+    def record(cls, event):
+        """
+        Store a verified event (a dict parsed from the webhook body). Returns
+        (stripe_event, created); a redelivered event is returned unchanged.
+        """
+        from datetime import datetime, timezone as dt_timezone
+        from django.db import IntegrityError
+        from .stripe_events import invoice_pk_for
+
+        invoice_pk = invoice_pk_for(event)
+        fields = {
+            'event_type': event['type'],
+            'invoice': Invoice.objects.filter(pk=invoice_pk).first() if invoice_pk else None,
+            'payload': event,
+            'stripe_created': datetime.fromtimestamp(event.get('created', 0), tz=dt_timezone.utc),
+        }
+        try:
+            with transaction.atomic():
+                return cls.objects.get_or_create(event_id=event['id'], defaults=fields)
+        except IntegrityError:
+            return cls.objects.get(event_id=event['id']), False
+
+    def enqueue(self):
+        """Hand the event to a worker once the current transaction commits."""
+        from .tasks import process_stripe_events
+        pk = str(self.pk)
+        transaction.on_commit(lambda: process_stripe_events.delay(pk), robust=True)
+
+    def replay(self):
+        """Mark the event pending again and re-enqueue it. Handlers are idempotent."""
+        StripeEvent.objects.filter(pk=self.pk).update(status=self.STATUS_PENDING, error='')
+        self.status = self.STATUS_PENDING
+        self.enqueue()
+
+
+class CheckoutSession(models.Model):
+    """
+    An open Stripe Checkout session for an invoice's balance. Reused for
+    repeat visits until it expires; dropped as soon as the balance changes.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.CASCADE, related_name='checkout_sessions',
+    )
+    session_id = models.CharField(max_length=255, unique=True)
+    url = models.TextField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Checkout Session'
+        indexes = [
+            models.Index(fields=['invoice', 'amount', 'expires_at'], name='checkout_invoice_amount_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.session_id} ({self.amount} {self.currency})'
+
+
+class BankStatement(models.Model):
+    """
+    An uploaded bank statement (CSV or OFX) and the outcome of reconciling
+    its lines against the organization's open invoices.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(
+        'organizations.Organization', on_delete=models.CASCADE, related_name='bank_statements',
+    )
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+    )
+    file = models.FileField(upload_to='statements/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    line_count = models.PositiveIntegerField(default=0)
+    matched_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Bank Statement'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.file.name} ({self.get_status_display()})'
+
+
+class BankStatementLine(models.Model):
+    """
+    One transaction from a bank statement. Confident matches get a Payment;
+    ambiguous ones wait in the review queue with their candidate invoices.
+    """
+    STATUS_MATCHED = 'matched'
+    STATUS_REVIEW = 'review'
+    STATUS_UNMATCHED = 'unmatched'
+    STATUS_IGNORED = 'ignored'
+    STATUS_CHOICES = [
+        (STATUS_MATCHED, 'Matched'),
+        (STATUS_REVIEW, 'Needs Review'),
+        (STATUS_UNMATCHED, 'Unmatched'),
+        (STATUS_IGNORED, 'Ignored'),
+    ]
+    REVIEW_STATUSES = (STATUS_REVIEW, STATUS_UNMATCHED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    statement = models.ForeignKey(BankStatement, on_delete=models.CASCADE, related_name='lines')
+    organization = models.ForeignKey(
+        'organizations.Organization', on_delete=models.CASCADE, related_name='bank_statement_lines',
+    )
+    line_number = models.PositiveIntegerField()
+    # Identifies the bank transaction across uploads so re-imports never pay twice.
+    fingerprint = models.CharField(max_length=64)
+    date = models.DateField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reference = models.CharField(max_length=500, blank=True)
+    counterparty = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='bank_statement_lines',
+    )
+    candidates = models.JSONField(default=list, blank=True)
+    payment = models.OneToOneField(
+        Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='bank_statement_line',
+    )
+
+    class Meta:
+        verbose_name = 'Bank Statement Line'
+        ordering = ['statement', 'line_number']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'fingerprint'], name='bank_line_fingerprint_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['statement', 'status', 'line_number'], name='bank_line_review_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.amount} {self.reference[:40]}'
+
+    def _lock_for_review(self):
+        """Lock the line; False when another request has already resolved it."""
+        return type(self).objects.select_for_update().filter(
+            pk=self.pk, status__in=self.REVIEW_STATUSES,
+        ).exists()
+
+    def confirm(self, invoice):
+        """
+        Resolve a queued line by recording it as a payment against `invoice`.
+        Returns False (and records nothing) if the line is no longer queued.
+        """
+        with transaction.atomic():
+            if not self._lock_for_review():
+                return False
+            self.payment = Payment.objects.create(
+                invoice=invoice,
+                amount=self.amount,
+                payment_date=self.date or date.today(),
+                method=Payment.METHOD_BANK_TRANSFER,
+                notes=f'Bank statement: {self.reference}'[:1000],
+            )
+            self.invoice = invoice
+            self.status = self.STATUS_MATCHED
+            self.save(update_fields=['payment', 'invoice', 'status'])
+            BankStatement.objects.filter(pk=self.statement_id).update(
+                matched_count=models.F('matched_count') + 1,
+                review_count=models.F('review_count') - 1,
+            )
+        return True
+
+    def ignore(self):
+        """Drop a queued line from review; False if it is no longer queued."""
+        with transaction.atomic():
+            if not self._lock_for_review():
+                return False
+            self.status = self.STATUS_IGNORED
+            self.save(update_fields=['status'])
+            BankStatement.objects.filter(pk=self.statement_id).update(review_count=models.F('review_count') - 1)
+        return True
@@ -0,0 +1,292 @@
+"""
+Bank statement import and reconciliation.
+
+Statement rows are streamed from the uploaded CSV or OFX file and matched
+against an in-memory index of the organization's open invoices, built from
+a single query. Confident matches become payments via bulk_create and all
+affected invoice balances are updated in one locked pass at the end;
+anything ambiguous is left in the review queue.
+"""
+import csv
+import hashlib
+import io
+import re
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from clients.models import Client
+from dashboard.models import DailyRevenue
+from invoices.models import Invoice
+from .models import BankStatement, BankStatementLine, Payment
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_CANDIDATES = 10
+
+# Accepted CSV header names (lower-cased) for each statement field.
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted', 'posting date', 'booking date', 'value date'),
+    'amount': ('amount', 'value', 'transaction amount'),
+    'credit': ('credit', 'paid in', 'money in', 'deposit'),
+    'debit': ('debit', 'paid out', 'money out', 'withdrawal'),
+    'reference': ('reference', 'description', 'details', 'memo', 'narrative', 'payment reference'),
+    'counterparty': ('name', 'payer', 'payee', 'counterparty', 'from', 'remitter'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y', '%d-%m-%Y', '%Y%m%d')
+
+
+# ─── Parsing ───────────────────────────────────────────────────────────────────
+
+def parse_amount(value):
+    value = (value or '').strip()
+    negative = value.startswith('(') and value.endswith(')')
+    value = re.sub(r'[^\d.\-]', '', value)
+    if not value:
+        return None
+    try:
+        amount = Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+
+def parse_date(value):
+    value = (value or '').strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _csv_rows(binary):
+    reader = csv.reader(io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline=''))
+    header = [h.strip().lower() for h in next(reader, [])]
+    columns = {
+        field: next((header.index(name) for name in names if name in header), None)
+        for field, names in CSV_COLUMNS.items()
+    }
+
+    def cell(row, field):
+        i = columns[field]
+        return row[i] if i is not None and i < len(row) else ''
+
+    for row in reader:
+        if not any(row):
+            continue
+        amount = parse_amount(cell(row, 'amount'))
+        if amount is None:
+            credit, debit = parse_amount(cell(row, 'credit')), parse_amount(cell(row, 'debit'))
+            amount = (credit or 0) - abs(debit or 0)
+        yield {
+            'date': parse_date(cell(row, 'date')),
+            'amount': amount,
+            'reference': cell(row, 'reference').strip(),
+            'counterparty': cell(row, 'counterparty').strip(),
+            'fitid': '',
+        }
+
+
+def _ofx_tags(text):
+    """Yield (TAG, value) pairs from SGML or XML OFX, reading it in chunks."""
+    buffer = ''
+    while chunk := text.read(64 * 1024):
+        *parts, buffer = (buffer + chunk).split('<')
+        for part in parts:
+            tag, _, value = part.partition('>')
+            yield tag.strip().upper(), value.strip()
+    tag, _, value = buffer.partition('>')
+    yield tag.strip().upper(), value.strip()
+
+
+def _ofx_rows(binary):
+    txn = None
+    for tag, value in _ofx_tags(io.TextIOWrapper(binary, encoding='utf-8', errors='replace')):
+        if tag == 'STMTTRN':
+            txn = {}
+        elif tag == '/STMTTRN' and txn is not None:
+            yield {
+                'date': parse_date(txn.get('DTPOSTED', '')[:8]),
+                'amount': parse_amount(txn.get('TRNAMT')) or Decimal('0'),
+                'reference': ' '.join(filter(None, [txn.get('MEMO', ''), txn.get('CHECKNUM', '')])),
+                'counterparty': txn.get('NAME', '') or txn.get('PAYEE', ''),
+                'fitid': txn.get('FITID', ''),
+            }
+            txn = None
+        elif txn is not None and not tag.startswith('/'):
+            txn[tag] = value
+
+
+def iter_statement_rows(binary, filename):
+    """Stream statement transactions as dicts from an open binary CSV/OFX file."""
+    if filename.lower().endswith(('.ofx', '.qfx')):
+        return _ofx_rows(binary)
+    return _csv_rows(binary)
+
+
+# ─── Matching ──────────────────────────────────────────────────────────────────
+
+def _number_key(value):
+    return re.sub(r'[^A-Z0-9]', '', value.upper())
+
+
+def _name_key(value):
+    return ' '.join(re.findall(r'[a-z0-9]+', value.lower()))
+
+
+class OpenInvoiceIndex:
+    """An organization's open invoices keyed by number, balance and client name."""
+
+    def __init__(self, organization):
+        rows = (
+            Invoice.objects.filter(organization=organization, status__in=Invoice.OPEN_STATUSES, total__gt=F('amount_paid'))
+            .order_by('due_date')
+            .values_list('pk', 'invoice_number', 'total', 'amount_paid', 'client__name')
+        )
+        self.balances = {}
+        self.by_number = {}
+        self.by_amount = defaultdict(list)
+        self.by_client = defaultdict(list)
+        for pk, number, total, amount_paid, client_name in rows:
+            balance = total - amount_paid
+            self.balances[pk] = balance
+            key = _number_key(number)
+            if len(key) >= 3:
+                self.by_number[key] = pk
+            self.by_amount[balance].append(pk)
+            self.by_client[_name_key(client_name)].append(pk)
+
+    def _open(self, pks):
+        return [pk for pk in pks if self.balances.get(pk, 0) > 0]
+
+    def _numbers_in(self, text):
+        tokens = [_number_key(t) for t in re.findall(r'[A-Za-z0-9][A-Za-z0-9\-/#_.]*', text)]
+        # Also try adjacent pairs so "INV 0042" finds INV-0042.
+        keys = tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+        return list(dict.fromkeys(pk for key in keys if (pk := self.by_number.get(key))))
+
+    def match(self, amount, reference, counterparty):
+        """Return (status, invoice_pk, candidate_pks) for one credit."""
+        referenced = self._open(self._numbers_in(f'{reference} {counterparty}'))
+        if len(referenced) == 1:
+            pk = referenced[0]
+            if amount <= self.balances[pk]:
+                return BankStatementLine.STATUS_MATCHED, pk, []
+            return BankStatementLine.STATUS_REVIEW, None, referenced
+        if referenced:
+            return BankStatementLine.STATUS_REVIEW, None, referenced[:MAX_CANDIDATES]
+
+        by_amount = self._open(self.by_amount.get(amount, []))
+        by_client = self._open(self.by_client.get(_name_key(counterparty), [])) if counterparty else []
+        client_pks = set(by_client)
+        both = [pk for pk in by_amount if pk in client_pks]
+        if len(both) == 1:
+            return BankStatementLine.STATUS_MATCHED, both[0], []
+        candidates = both or by_amount or by_client
+        if candidates:
+            return BankStatementLine.STATUS_REVIEW, None, candidates[:MAX_CANDIDATES]
+        return BankStatementLine.STATUS_UNMATCHED, None, []
+
+    def consume(self, pk, amount):
+        """Reduce an invoice's remaining balance after a line is matched to it."""
+        balance = self.balances[pk]
+        self.by_amount[balance].remove(pk)
+        self.balances[pk] = balance - amount
+        if self.balances[pk] > 0:
+            self.by_amount[self.balances[pk]].append(pk)
+
+
+# ─── Import ────────────────────────────────────────────────────────────────────
+
+def _fingerprint(row, occurrence):
+    if row['fitid']:
+        raw = f"ofx|{row['fitid']}"
+    else:
+        raw = f"{row['date']}|{row['amount']}|{row['reference']}|{row['counterparty']}|{occurrence}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def import_statement(statement):
+    """Parse, match and record every line of a BankStatement; returns it with counts set."""
+    organization = statement.organization
+    index = OpenInvoiceIndex(organization)
+    seen = Counter()
+    deltas = defaultdict(Decimal)
+    counts = Counter()
+    imported = set()
+    payment_days = set()
+
+    with transaction.atomic(), statement.file.open('rb') as binary:
+        numbered = enumerate(iter_statement_rows(binary, statement.file.name), start=1)
+        while chunk := list(islice(numbered, IMPORT_CHUNK_SIZE)):
+            lines = []
+            for line_number, row in chunk:
+                base = (row['date'], row['amount'], row['reference'], row['counterparty'])
+                seen[base] += 1
+                lines.append(BankStatementLine(
+                    statement=statement,
+                    organization=organization,
+                    line_number=line_number,
+                    fingerprint=_fingerprint(row, seen[base]),
+                    date=row['date'],
+                    amount=row['amount'] or Decimal('0'),
+                    reference=row['reference'][:500],
+                    counterparty=row['counterparty'][:255],
+                ))
+            counts['lines'] += len(lines)
+            existing = set(
+                BankStatementLine.objects.filter(
+                    organization=organization, fingerprint__in=[line.fingerprint for line in lines],
+                ).values_list('fingerprint', flat=True)
+            )
+            fresh = []
+            for line in lines:
+                if line.fingerprint in existing or line.fingerprint in imported:
+                    counts['duplicates'] += 1
+                else:
+                    imported.add(line.fingerprint)
+                    fresh.append(line)
+            lines = fresh
+
+            payments = []
+            for line in lines:
+                if line.amount <= 0:
+                    line.status = BankStatementLine.STATUS_IGNORED
+                    continue
+                line.status, invoice_pk, candidates = index.match(line.amount, line.reference, line.counterparty)
+                line.candidates = [str(pk) for pk in candidates]
+                if invoice_pk is None:
+                    counts['review'] += 1
+                    continue
+                line.invoice_id = invoice_pk
+                line.payment = Payment(
+                    organization=organization,
+                    invoice_id=invoice_pk,
+                    amount=line.amount,
+                    payment_date=line.date or date.today(),
+                    method=Payment.METHOD_BANK_TRANSFER,
+                    notes=f'Bank statement: {line.reference}'[:1000],
+                )
+                payments.append(line.payment)
+                index.consume(invoice_pk, line.amount)
+                deltas[invoice_pk] += line.amount
+                payment_days.add((invoice_pk, line.payment.payment_date))
+                counts['matched'] += 1
+            Payment.objects.bulk_create(payments)
+            BankStatementLine.objects.bulk_create(lines)
+
+        clients = {invoice.pk: invoice.client_id for invoice in Invoice.apply_payments(deltas)}
+        Client.record_payment_dates((clients[pk], day) for pk, day in payment_days)
+        DailyRevenue.refresh((clients[pk], day) for pk, day in payment_days)
+        statement.line_count = counts['lines']
+        statement.matched_count = counts['matched']
+        statement.review_count = counts['review']
+        statement.duplicate_count = counts['duplicates']
+        statement.status = BankStatement.STATUS_COMPLETE
+        statement.processed_at = timezone.now()
+        statement.save()
+    return statement
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clients.models import Client
+from invoices.models import Invoice
+from invoices.signals import balances_changed
+from organizations.models import Organization
+from .checkout import discard_stale_sessions
+from .models import Payment
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, origin=None, **kwargs):
+    # Runs inside the delete's transaction, including queryset and cascade deletes.
+    # When the invoice itself (or its organization) is being deleted there is no
+    # balance left to reverse.
+    if isinstance(origin, (Invoice, Organization)) or getattr(origin, 'model', None) in (Invoice, Organization):
+        return
+    invoice = Invoice.apply_payment(instance.invoice_id, -instance.amount)
+    if invoice and instance.amount > 0:
+        Client.forget_payment_date(invoice.client_id, instance.payment_date)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_balance_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {'total', 'amount_paid', 'status'} & set(update_fields):
+        return
+    discard_stale_sessions(instance)
+
+
+@receiver(balances_changed)
+def invoice_balances_changed(sender, invoices, **kwargs):
+    discard_stale_sessions(*invoices)
@@ -0,0 +1,175 @@
+"""
+Handlers that apply stored Stripe webhook events to invoices and payments.
+
+Every handler is idempotent — payments are matched on their PaymentIntent id
+and refunds on the cumulative amount refunded — so an event can be replayed
+or delivered twice without double-counting.
+"""
+import uuid
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from invoices.models import Invoice
+from .models import CheckoutSession, Payment, StripeEvent
+
+
+def _amount(cents):
+    return Decimal(cents or 0) / 100
+
+
+def _payment_intent_id(obj):
+    if obj.get('object') == 'payment_intent':
+        return obj.get('id')
+    return obj.get('payment_intent')
+
+
+def invoice_pk_for(event):
+    """The invoice an event belongs to, from its metadata or its PaymentIntent."""
+    obj = event['data']['object']
+    invoice_pk = (obj.get('metadata') or {}).get('invoice_pk')
+    if invoice_pk:
+        try:
+            return uuid.UUID(str(invoice_pk))
+        except ValueError:
+            return None
+    payment_intent = _payment_intent_id(obj)
+    if not payment_intent:
+        return None
+    return (
+        Payment.objects.filter(stripe_charge_id=payment_intent).values_list('invoice_id', flat=True).first()
+        or Invoice.objects.filter(stripe_payment_intent=payment_intent).values_list('pk', flat=True).first()
+    )
+
+
+def _record_payment(invoice, payment_intent, amount):
+    if invoice is None or not payment_intent or amount <= 0:
+        return False
+    if Payment.objects.filter(invoice=invoice, stripe_charge_id=payment_intent, amount__gt=0).exists():
+        return False
+    Payment.objects.create(
+        invoice=invoice,
+        amount=amount,
+        payment_date=date.today(),
+        method=Payment.METHOD_STRIPE,
+        stripe_charge_id=payment_intent,
+        notes='Auto-recorded via Stripe webhook',
+    )
+    return True
+
+
+def checkout_session_completed(invoice, session):
+    CheckoutSession.objects.filter(session_id=session.get('id')).delete()
+    # Delayed payment methods complete later with payment_intent.succeeded.
+    if session.get('payment_status') != 'paid':
+        return False
+    return _record_payment(
+        invoice, session.get('payment_intent') or session.get('id'), _amount(session.get('amount_total')),
+    )
+
+
+def checkout_session_expired(invoice, session):
+    return CheckoutSession.objects.filter(session_id=session.get('id')).delete()[0] > 0
+
+
+def payment_intent_succeeded(invoice, intent):
+    return _record_payment(invoice, intent.get('id'), _amount(intent.get('amount_received')))
+
+
+def payment_intent_failed(invoice, intent):
+    from notifications.models import Notification
+    from organizations.models import OrganizationMembership
+
+    if invoice is None:
+        return False
+    reason = (intent.get('last_payment_error') or {}).get('message') or 'the card was declined'
+    recipients = OrganizationMembership.objects.filter(
+        organization_id=invoice.organization_id,
+        role__in=[OrganizationMembership.ROLE_OWNER, OrganizationMembership.ROLE_ADMIN],
+    ).values_list('user_id', flat=True)
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id,
+            notification_type=Notification.TYPE_PAYMENT_FAILED,
+            message=f'Online payment for {invoice.invoice_number} failed: {reason}'[:500],
+            link=reverse('invoices:detail', args=[invoice.pk]),
+        )
+        for user_id in recipients
+    ])
+    return True
+
+
+def charge_refunded(invoice, charge):
+    payment_intent = charge.get('payment_intent') or charge.get('id')
+    if invoice is None or not payment_intent:
+        return False
+    recorded = Payment.objects.filter(
+        invoice=invoice, stripe_charge_id=payment_intent, amount__lt=0,
+    ).aggregate(total=Sum('amount'))['total'] or 0
+    # amount_refunded is cumulative across partial refunds of the charge.
+    outstanding = _amount(charge.get('amount_refunded')) + recorded
+    if outstanding <= 0:
+        return False
+    Payment.objects.create(
+        invoice=invoice,
+        amount=-outstanding,
+        payment_date=date.today(),
+        method=Payment.METHOD_STRIPE,
+        stripe_charge_id=payment_intent,
+        notes='Refund recorded via Stripe webhook',
+    )
+    return True
+
+
+HANDLERS = {
+    'checkout.session.completed': checkout_session_completed,
+    'checkout.session.expired': checkout_session_expired,
+    'payment_intent.succeeded': payment_intent_succeeded,
+    'payment_intent.payment_failed': payment_intent_failed,
+    'charge.refunded': charge_refunded,
+}
+
+
+def process_pending(event_pk, final_attempt=False):
+    """
+    Apply every pending event for the given event's invoice in Stripe order,
+    holding the invoice row lock so workers never interleave on one invoice.
+    Stops at the first failure, leaving it and later events pending for the
+    retry. On the final attempt the failing event is marked failed and the
+    later ones still run, so they are never stuck behind it. Returns False
+    if an event failed.
+    """
+    event = StripeEvent.objects.filter(pk=event_pk).only('pk', 'invoice_id').first()
+    if event is None:
+        return True
+    with transaction.atomic():
+        invoice = None
+        events = StripeEvent.objects.select_for_update().filter(status=StripeEvent.STATUS_PENDING)
+        if event.invoice_id:
+            invoice = Invoice.objects.select_for_update().filter(pk=event.invoice_id).first()
+            events = events.filter(invoice_id=event.invoice_id)
+        else:
+            events = events.filter(pk=event.pk)
+        succeeded = True
+        for pending in events.order_by('stripe_created', 'received_at'):
+            handler = HANDLERS.get(pending.event_type)
+            pending.attempts += 1
+            pending.processed_at = timezone.now()
+            try:
+                with transaction.atomic():
+                    applied = handler(invoice, pending.payload['data']['object']) if handler else False
+            except Exception as exc:
+                pending.error = repr(exc)
+                if not final_attempt:
+                    pending.save(update_fields=['status', 'attempts', 'error', 'processed_at'])
+                    return False
+                pending.status = StripeEvent.STATUS_FAILED
+                pending.save(update_fields=['status', 'attempts', 'error', 'processed_at'])
+                succeeded = False
+                continue
+            pending.status = StripeEvent.STATUS_PROCESSED if applied else StripeEvent.STATUS_IGNORED
+            pending.error = ''
+            pending.save(update_fields=['status', 'attempts', 'error', 'processed_at'])
+    return succeeded
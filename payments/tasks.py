@@ -0,0 +1,36 @@
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def process_stripe_events(self, event_pk):
+    """Apply pending Stripe events for the event's invoice, oldest first; retry on failure."""
+    from .stripe_events import process_pending
+
+    if not process_pending(event_pk, final_attempt=self.request.retries >= self.max_retries):
+        raise self.retry(countdown=60 * 2 ** self.request.retries)
+
+
+@shared_task(ignore_result=True)
+def expire_checkout_sessions(session_ids):
+    """Expire superseded Checkout sessions at Stripe so they can't be paid."""
+    from .checkout import expire_sessions
+
+    expire_sessions(session_ids)
+
+
+@shared_task(ignore_result=True)
+def import_bank_statement(statement_pk):
+    """Reconcile an uploaded bank statement against open invoices."""
+    from django.utils import timezone
+    from .models import BankStatement
+    from .reconciliation import import_statement
+
+    statement = BankStatement.objects.select_related('organization').get(pk=statement_pk)
+    BankStatement.objects.filter(pk=statement.pk).update(status=BankStatement.STATUS_PROCESSING)
+    try:
+        import_statement(statement)
+    except Exception as exc:
+        BankStatement.objects.filter(pk=statement.pk).update(
+            status=BankStatement.STATUS_FAILED, error=str(exc)[:1000], processed_at=timezone.now(),
+        )
+        raise
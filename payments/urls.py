@@ -7,4 +7,9 @@ urlpatterns = [
     path('invoice/<uuid:invoice_pk>/record/', views.record_payment, name='record'),
     path('invoice/<uuid:invoice_pk>/stripe/', views.stripe_checkout, name='stripe_checkout'),
     path('invoice/<uuid:invoice_pk>/stripe/success/', views.stripe_success, name='stripe_success'),
+    path('export/', views.payment_export, name='export'),
+    path('client/<uuid:client_pk>/receipt/', views.record_receipt, name='record_receipt'),
+    path('statements/', views.statement_list, name='statement_list'),
+    path('statements/<uuid:pk>/', views.statement_detail, name='statement_detail'),
+    path('statements/lines/<uuid:pk>/resolve/', views.statement_line_resolve, name='statement_line_resolve'),
 ]
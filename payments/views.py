@@ -1,4 +1,5 @@
 import json
+import uuid
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -6,9 +7,20 @@ from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from invoices.export import tabular_response
 from invoices.models import Invoice
-from .models import Payment
-from .forms import PaymentForm
+from invoices.pagination import keyset_paginate
+from .models import BankStatement, BankStatementLine, Payment, Receipt, StripeEvent
+from .forms import BankStatementForm, PaymentForm, ReceiptForm
+from .checkout import open_checkout_session
+
+EXPORT_COLUMNS = [
+    ('Date', 'payment_date'), ('Amount', 'amount'), ('Method', 'method'),
+    ('Invoice #', 'invoice__invoice_number'), ('Client', 'invoice__client__name'),
+    ('Stripe Charge', 'stripe_charge_id'), ('Notes', 'notes'), ('Recorded', 'created_at'),
+]
 
 
 def get_org(request):
@@ -35,11 +47,131 @@ def record_payment(request, invoice_pk):
     return render(request, 'payments/form.html', {'form': form, 'invoice': invoice})
 
 
+@login_required
+def payment_export(request):
+    """
+    Stream the org's payments as CSV or XLSX (?export=xlsx), filtered by
+    ?client=, ?method=, ?from= and ?to= (YYYY-MM-DD).
+    """
+    org = get_org(request)
+    client = request.GET.get('client', '')
+    try:
+        client = uuid.UUID(client) if client else ''
+        dates = {name: parse_date(request.GET.get(name, '')) for name in ('from', 'to')}
+    except ValueError:  # A well-formed but impossible date, e.g. 2026-02-30
+        return HttpResponse('Invalid filter.', status=400)
+    if any(request.GET.get(name) and value is None for name, value in dates.items()):
+        return HttpResponse('Invalid filter.', status=400)
+    date_from, date_to = dates['from'], dates['to']
+    payments = Payment.filtered(org, client, request.GET.get('method', ''), date_from, date_to)
+    payments = payments.order_by('-payment_date', '-created_at', '-id')
+    return tabular_response(payments, EXPORT_COLUMNS, 'payments', request.GET.get('export', 'csv'))
+
+
+@login_required
+def record_receipt(request, client_pk):
+    """Record one payment from a client, applied to their open invoices oldest first."""
+    from clients.models import Client
+
+    org = get_org(request)
+    client = get_object_or_404(Client, pk=client_pk, organization=org)
+    open_invoices = client.invoices.filter(status__in=Invoice.OPEN_STATUSES).order_by('due_date', 'issue_date')
+
+    if request.method == 'POST':
+        form = ReceiptForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            receipt = Receipt.record(
+                org, client, data['amount'], data['payment_date'], data['method'], reference=data['reference'],
+            )
+            count = receipt.allocations.count()
+            message = f'${receipt.amount} applied to {count} invoice{"s" if count != 1 else ""}.'
+            if receipt.unallocated_amount:
+                message += f' ${receipt.unallocated_amount} left unallocated.'
+            messages.success(request, message)
+            return redirect('clients:detail', pk=client.pk)
+    else:
+        form = ReceiptForm()
+
+    return render(request, 'payments/receipt_form.html', {
+        'form': form, 'client': client, 'open_invoices': open_invoices,
+    })
+
+
+@login_required
+def statement_list(request):
+    org = get_org(request)
+    if request.method == 'POST':
+        form = BankStatementForm(request.POST, request.FILES)
+        if form.is_valid():
+            statement = form.save(commit=False)
+            statement.organization = org
+            statement.uploaded_by = request.user
+            statement.save()
+            from .tasks import import_bank_statement
+            pk = str(statement.pk)
+            transaction.on_commit(lambda: import_bank_statement.delay(pk), robust=True)
+            messages.success(request, 'Statement uploaded — matching payments now.')
+            return redirect('payments:statement_detail', pk=statement.pk)
+    else:
+        form = BankStatementForm()
+    statements = BankStatement.objects.filter(organization=org)[:50]
+    return render(request, 'payments/statement_list.html', {'form': form, 'statements': statements})
+
+
+@login_required
+def statement_detail(request, pk):
+    """Import results and the queue of lines that need a human decision."""
+    org = get_org(request)
+    statement = get_object_or_404(BankStatement, pk=pk, organization=org)
+    queue = statement.lines.filter(status__in=BankStatementLine.REVIEW_STATUSES)
+    page = keyset_paginate(queue, request, ['line_number', 'id'])
+    candidate_pks = {pk for line in page for pk in line.candidates}
+    candidates = Invoice.objects.filter(organization=org, pk__in=candidate_pks).select_related('client').in_bulk()
+    for line in page:
+        line.candidate_invoices = [candidates[pk] for pk in map(uuid.UUID, line.candidates) if pk in candidates]
+    return render(request, 'payments/statement_detail.html', {
+        'statement': statement,
+        'lines': page,
+        'page': page,
+    })
+
+
+@login_required
+@require_POST
+def statement_line_resolve(request, pk):
+    """Match a queued statement line to an invoice, or ignore it."""
+    org = get_org(request)
+    line = get_object_or_404(
+        BankStatementLine, pk=pk, organization=org, status__in=BankStatementLine.REVIEW_STATUSES,
+    )
+    if request.POST.get('action') == 'ignore':
+        if line.ignore():
+            messages.success(request, 'Statement line ignored.')
+        else:
+            messages.info(request, 'This statement line has already been resolved.')
+        return redirect('payments:statement_detail', pk=line.statement_id)
+
+    try:
+        invoice_pk = uuid.UUID(request.POST.get('invoice', ''))
+    except ValueError:
+        invoice_pk = None
+    invoice = invoice_pk and Invoice.objects.filter(
+        organization=org, pk=invoice_pk, status__in=Invoice.OPEN_STATUSES,
+    ).first()
+    if not invoice:
+        messages.error(request, 'Choose an invoice to match this line to.')
+    elif line.confirm(invoice):
+        messages.success(request, f'${line.amount} recorded against {invoice.invoice_number}.')
+    else:
+        messages.info(request, 'This statement line has already been resolved.')
+    return redirect('payments:statement_detail', pk=line.statement_id)
+
+
 def stripe_checkout(request, invoice_pk):
-    """Creates a Stripe Checkout session and redirects to Stripe.
+    """Redirects to a Stripe Checkout session for the balance, reusing an open one.
     No login required — clients access this from the public portal."""
-    invoice = get_object_or_404(Invoice, pk=invoice_pk)
-    org = invoice.organization
+    invoice = get_object_or_404(Invoice.objects.select_related('client', 'organization'), pk=invoice_pk)
 
     # Guard: only allow payment on unpaid, active invoices with a balance
     if invoice.status in ('paid', 'cancelled') or invoice.balance_due <= 0:
@@ -48,30 +180,13 @@ def stripe_checkout(request, invoice_pk):
     if not settings.STRIPE_SECRET_KEY:
         return redirect('invoices:portal', pk=invoice_pk)
 
-    import stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
     base_url = getattr(settings, 'SITE_URL', '').rstrip('/')
     success_url = f'{base_url}/payments/invoice/{invoice_pk}/stripe/success/'
     cancel_url = f'{base_url}/invoices/portal/{invoice_pk}/'
 
-    session = stripe.checkout.Session.create(
-        payment_method_types=['card'],
-        line_items=[{
-            'price_data': {
-                'currency': (invoice.client.currency or org.currency or 'usd').lower(),
-                'product_data': {'name': f'Invoice {invoice.invoice_number} — {org.name}'},
-                'unit_amount': int(invoice.balance_due * 100),
-            },
-            'quantity': 1,
-        }],
-        mode='payment',
-        success_url=success_url,
-        cancel_url=cancel_url,
-        metadata={'invoice_pk': str(invoice_pk)},
-    )
-    invoice.stripe_payment_intent = session.payment_intent or session.id
-    invoice.save(update_fields=['stripe_payment_intent'])
+    session = open_checkout_session(invoice, success_url, cancel_url)
+    if session is None:
+        return redirect('invoices:portal', pk=invoice_pk)  # Paid or cancelled meanwhile
     return redirect(session.url, permanent=False)
 
 
@@ -88,35 +203,21 @@ def stripe_success(request, invoice_pk):
 @csrf_exempt
 @require_POST
 def stripe_webhook(request):
-    """Handle Stripe webhook events to auto-mark invoices as paid."""
+    """Verify and store a Stripe webhook event; a Celery worker applies it."""
     if not settings.STRIPE_WEBHOOK_SECRET:
         return HttpResponse(status=400)
 
     import stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
-    except stripe.error.SignatureVerificationError:
+        stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
+        event = json.loads(payload)
+    except (ValueError, stripe.error.SignatureVerificationError):
         return HttpResponse(status=400)
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        invoice_pk = session.get('metadata', {}).get('invoice_pk')
-        if invoice_pk:
-            try:
-                invoice = Invoice.objects.get(pk=invoice_pk)
-                Payment.objects.create(
-                    invoice=invoice,
-                    amount=invoice.balance_due,
-                    payment_date=__import__('datetime').date.today(),
-                    method='stripe',
-                    stripe_charge_id=session.get('payment_intent', ''),
-                    notes='Auto-recorded via Stripe webhook',
-                )
-            except Invoice.DoesNotExist:
-                pass
-
+    stripe_event, created = StripeEvent.record(event)
+    if created or stripe_event.status == StripeEvent.STATUS_PENDING:
+        stripe_event.enqueue()
     return HttpResponse(status=200)
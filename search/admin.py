@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ['title', 'kind', 'organization', 'updated_at']
+    list_filter = ['kind', 'organization']
+    search_fields = ['title']
+    readonly_fields = ['organization', 'kind', 'object_id', 'title', 'document', 'updated_at']
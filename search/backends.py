@@ -0,0 +1,110 @@
+"""
+Indexing and lookup for SearchDocument.
+
+PostgreSQL matches every query term with LIKE against the trigram-indexed
+document; SQLite runs a prefix MATCH against the FTS5 mirror table.
+"""
+import re
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import SearchDocument
+
+FTS_TABLE = 'search_searchdocument_fts'
+
+
+def _terms(q):
+    return re.findall(r'\w+', q.lower())
+
+
+def matching_ids(organization, kind, q):
+    """Lazy queryset of object_ids of `kind` in the org whose document matches `q`."""
+    docs = SearchDocument.objects.filter(organization=organization, kind=kind)
+    terms = _terms(q)
+    if not terms:
+        return docs.none().values('object_id')
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        docs = docs.filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    else:
+        for term in terms:
+            docs = docs.filter(document__contains=term)
+    return docs.values('object_id')
+
+
+def _document(*parts):
+    return ' '.join(str(p) for p in parts if p).lower()
+
+
+def index_invoice(invoice):
+    descriptions = invoice.line_items.values_list('description', flat=True)
+    SearchDocument.objects.update_or_create(
+        kind=SearchDocument.KIND_INVOICE, object_id=invoice.pk,
+        defaults={
+            'organization_id': invoice.organization_id,
+            'title': invoice.invoice_number,
+            'document': _document(invoice.invoice_number, invoice.notes, *descriptions),
+        },
+    )
+
+
+def index_invoices(invoices):
+    """Upsert search documents for many invoices, reading their line items in one query."""
+    from invoices.models import InvoiceLineItem
+
+    descriptions = {}
+    for invoice_pk, description in (
+        InvoiceLineItem.objects.filter(invoice__in=[invoice.pk for invoice in invoices])
+        .values_list('invoice_id', 'description')
+    ):
+        descriptions.setdefault(invoice_pk, []).append(description)
+    SearchDocument.objects.bulk_create(
+        [
+            SearchDocument(
+                kind=SearchDocument.KIND_INVOICE,
+                object_id=invoice.pk,
+                organization_id=invoice.organization_id,
+                title=invoice.invoice_number,
+                document=_document(invoice.invoice_number, invoice.notes, *descriptions.get(invoice.pk, [])),
+            )
+            for invoice in invoices
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['organization', 'title', 'document', 'updated_at'],
+    )
+
+
+def index_client(client):
+    SearchDocument.objects.update_or_create(
+        kind=SearchDocument.KIND_CLIENT, object_id=client.pk,
+        defaults={
+            'organization_id': client.organization_id,
+            'title': client.name,
+            'document': _document(client.name, client.email, client.phone, client.tax_id),
+        },
+    )
+
+
+def index_clients(clients):
+    """Upsert search documents for many clients in one statement per batch."""
+    SearchDocument.objects.bulk_create(
+        [
+            SearchDocument(
+                kind=SearchDocument.KIND_CLIENT,
+                object_id=client.pk,
+                organization_id=client.organization_id,
+                title=client.name,
+                document=_document(client.name, client.email, client.phone, client.tax_id),
+            )
+            for client in clients
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['organization', 'title', 'document', 'updated_at'],
+    )
+
+
+def remove(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
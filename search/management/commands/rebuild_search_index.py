@@ -0,0 +1,32 @@
+from itertools import islice
+from django.core.management.base import BaseCommand
+from clients.models import Client
+from invoices.models import Invoice
+from search import backends
+
+
+def _chunks(queryset, size):
+    rows = queryset.iterator(chunk_size=size)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search documents for every client and invoice.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        clients = 0
+        for chunk in _chunks(Client.objects.order_by('pk'), size):
+            backends.index_clients(chunk)
+            clients += len(chunk)
+        invoices = 0
+        fields = ('pk', 'organization_id', 'invoice_number', 'notes')
+        for chunk in _chunks(Invoice.objects.only(*fields).order_by('pk'), size):
+            # One upsert per batch, with its line item descriptions read in one query.
+            backends.index_invoices(chunk)
+            invoices += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {clients} clients and {invoices} invoices.'))
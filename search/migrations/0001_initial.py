@@ -0,0 +1,108 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX search_document_trgm_idx ON search_searchdocument '
+            'USING gin (document gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        # External-content FTS5 table kept in sync with SearchDocument by triggers.
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5("
+            "document, content='search_searchdocument', content_rowid='id')"
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER search_searchdocument_ai AFTER INSERT ON search_searchdocument BEGIN '
+            'INSERT INTO search_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END'
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER search_searchdocument_ad AFTER DELETE ON search_searchdocument BEGIN '
+            "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, document) "
+            "VALUES ('delete', old.id, old.document); END"
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER search_searchdocument_au AFTER UPDATE ON search_searchdocument BEGIN '
+            "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, document) "
+            "VALUES ('delete', old.id, old.document); "
+            'INSERT INTO search_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END'
+        )
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_document_trgm_idx')
+    elif vendor == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS search_searchdocument_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS search_searchdocument_fts')
+
+
+def backfill(apps, schema_editor):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    Invoice = apps.get_model('invoices', 'Invoice')
+    Client = apps.get_model('clients', 'Client')
+
+    def document(*parts):
+        return ' '.join(str(p) for p in parts if p).lower()
+
+    docs = []
+
+    def add(doc):
+        docs.append(doc)
+        if len(docs) >= 1000:
+            SearchDocument.objects.bulk_create(docs)
+            docs.clear()
+
+    for client in Client.objects.iterator(chunk_size=1000):
+        add(SearchDocument(
+            organization_id=client.organization_id, kind='client', object_id=client.pk,
+            title=client.name, document=document(client.name, client.email, client.phone, client.tax_id),
+        ))
+    for invoice in Invoice.objects.prefetch_related('line_items').iterator(chunk_size=1000):
+        descriptions = [item.description for item in invoice.line_items.all()]
+        add(SearchDocument(
+            organization_id=invoice.organization_id, kind='invoice', object_id=invoice.pk,
+            title=invoice.invoice_number, document=document(invoice.invoice_number, invoice.notes, *descriptions),
+        ))
+    SearchDocument.objects.bulk_create(docs)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('clients', '0001_initial'),
+        ('invoices', '0003_invoice_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('invoice', 'Invoice'), ('client', 'Client')], max_length=10)),
+                ('object_id', models.UUIDField()),
+                ('title', models.CharField(max_length=300)),
+                ('document', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'indexes': [models.Index(fields=['organization', 'kind'], name='search_org_kind_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
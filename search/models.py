@@ -0,0 +1,33 @@
+from django.db import models
+from organizations.models import Organization
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized, lower-cased search text for one invoice or client.
+    Indexed with pg_trgm on PostgreSQL and mirrored into FTS5 on SQLite
+    (see migrations/0001_initial.py).
+    """
+    KIND_INVOICE = 'invoice'
+    KIND_CLIENT = 'client'
+    KIND_CHOICES = [
+        (KIND_INVOICE, 'Invoice'),
+        (KIND_CLIENT, 'Client'),
+    ]
+
+    organization = models.ForeignKey(
+        Organization, on_delete=models.CASCADE, related_name='search_documents',
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.UUIDField()
+    title = models.CharField(max_length=300)
+    document = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Search Document'
+        unique_together = ('kind', 'object_id')
+        indexes = [models.Index(fields=['organization', 'kind'], name='search_org_kind_idx')]
+
+    def __str__(self):
+        return f'{self.kind}: {self.title}'
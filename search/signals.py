@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from clients.models import Client
+from invoices.models import Invoice, InvoiceLineItem
+from . import backends
+from .models import SearchDocument
+
+
+def _reindex_invoice(invoice_pk):
+    invoice = Invoice.objects.filter(pk=invoice_pk).first()
+    if invoice:
+        backends.index_invoice(invoice)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, **kwargs):
+    # Deferred to commit so bulk line item writes in the same transaction are included.
+    transaction.on_commit(lambda: _reindex_invoice(instance.pk), robust=True)
+
+
+@receiver(post_save, sender=InvoiceLineItem)
+@receiver(post_delete, sender=InvoiceLineItem)
+def line_item_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _reindex_invoice(instance.invoice_id), robust=True)
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    backends.remove(SearchDocument.KIND_INVOICE, instance.pk)
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, **kwargs):
+    # After commit, like invoices: a failed index write must not roll back the save.
+    transaction.on_commit(lambda: backends.index_client(instance), robust=True)
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    backends.remove(SearchDocument.KIND_CLIENT, instance.pk)
@@ -0,0 +1,44 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.urls import reverse
+from clients.models import Client
+from invoices.models import Invoice
+from .backends import matching_ids
+from .models import SearchDocument
+
+RESULT_LIMIT = 10
+
+
+def get_org(request):
+    m = request.user.memberships.select_related('organization').first()
+    return m.organization if m else None
+
+
+@login_required
+def search(request):
+    """Unified search over invoices (number, notes, line items) and clients, as JSON."""
+    org = get_org(request)
+    q = request.GET.get('q', '').strip()
+    invoices, clients = [], []
+    if q and org:
+        invoices = Invoice.filtered(org, q=q)[:RESULT_LIMIT]
+        clients = Client.objects.filter(
+            organization=org, pk__in=matching_ids(org, SearchDocument.KIND_CLIENT, q),
+        )[:RESULT_LIMIT]
+    return JsonResponse({
+        'q': q,
+        'invoices': [{
+            'id': str(inv.pk),
+            'invoice_number': inv.invoice_number,
+            'client': inv.client.name,
+            'status': inv.status,
+            'total': str(inv.total),
+            'url': reverse('invoices:detail', args=[inv.pk]),
+        } for inv in invoices],
+        'clients': [{
+            'id': str(client.pk),
+            'name': client.name,
+            'email': client.email,
+            'url': reverse('clients:detail', args=[client.pk]),
+        } for client in clients],
+    })